@@ -1,6 +1,8 @@
 import numpy as np
 import argparse
-from rfid import PulseIntervalEncoder, RFIDReaderCommand, epc_str_to_bits
+import os
+from inventory import InventoryScript
+from rfid import epc_str_to_bits
 
 # TAGS = {
 #     1: "E200470C09806026E477010D",
@@ -17,32 +19,81 @@ TAGS = {
 }
 
 
-def reader_cmd_gen(samp_rate=2e6, filter="all") -> np.ndarray:
-    pie = PulseIntervalEncoder(samp_rate)
-    reader = RFIDReaderCommand(pie)
+def inventory_script(filter="all") -> InventoryScript:
+    script = InventoryScript()
     # add 100ms of silence
-    sig = [0] * int(0.05 * samp_rate)
-    sig += [1] * int(0.05 * samp_rate)
+    script.silence(50000).cw(50000)
     if filter == "all":
-        sig += reader.query(q=0) + [1] * 2500
-        sig += (reader.query_adjust() + [1] * 2500) * 99
+        script.query(q=0).cw(1250)
     else:
         filter = filter.split(",")
         filter = [int(tag_id) for tag_id in filter]
         for index, tag_id in enumerate(filter):
-            sig += (
-                reader.select(
-                    pointer=32,
-                    length=96,
-                    mask=epc_str_to_bits(TAGS[tag_id]),
-                    mem_bank="EPC",
-                    action=0 if index == 0 else 1,
-                )
-                + [1] * 300
-            )
-        sig += reader.query(q=0, sel="sl") + [1] * 2500
-        sig += (reader.query_adjust() + [1] * 2500) * 99
-    return (np.array(sig) + 0j).astype(np.complex64)
+            script.select(
+                pointer=32,
+                length=96,
+                mask=epc_str_to_bits(TAGS[tag_id]),
+                mem_bank="EPC",
+                action=0 if index == 0 else 1,
+            ).cw(150)
+        script.query(q=0, sel="sl").cw(1250)
+    for _ in range(99):
+        script.query_adjust().cw(1250)
+    return script
+
+
+def reader_cmd_schedule(samp_rate=2e6, filter="all"):
+    """
+    Yields the segments of the reader command schedule in order.
+
+    Command waveforms are yielded as complex64 arrays, silence and carrier as
+    `(level, n_samples)` tuples so that long constant runs are never materialized.
+    """
+    for _, segment in inventory_script(filter).segments(samp_rate):
+        yield segment
+
+
+def reader_cmd_gen(samp_rate=2e6, filter="all") -> np.ndarray:
+    sig, _ = inventory_script(filter).compile(samp_rate)
+    return sig
+
+
+def reader_cmd_chunks(samp_rate=2e6, filter="all", chunk_size=65536, repeat=1):
+    """
+    Streams the reader command schedule as complex64 chunks.
+
+    Args:
+        samp_rate (float): The sample rate in Hz.
+        filter (str): "all" or a comma separated list of tag ids to select.
+        chunk_size (int): The number of samples per chunk. Only the last chunk may be shorter.
+        repeat (int, optional): How many times the schedule is played back to back.
+            None repeats it forever. Defaults to 1.
+
+    Yields:
+        np.ndarray: The next chunk of the schedule.
+    """
+    schedule = list(reader_cmd_schedule(samp_rate, filter))
+    buf = np.empty(chunk_size, dtype=np.complex64)
+    n_buf = 0
+    n_played = 0
+    while repeat is None or n_played < repeat:
+        for segment in schedule:
+            n_segment = segment[1] if isinstance(segment, tuple) else len(segment)
+            pos = 0
+            while pos < n_segment:
+                n = min(chunk_size - n_buf, n_segment - pos)
+                if isinstance(segment, tuple):
+                    buf[n_buf : n_buf + n] = segment[0]
+                else:
+                    buf[n_buf : n_buf + n] = segment[pos : pos + n]
+                n_buf += n
+                pos += n
+                if n_buf == chunk_size:
+                    yield buf.copy()
+                    n_buf = 0
+        n_played += 1
+    if n_buf:
+        yield buf[:n_buf].copy()
 
 
 if __name__ == "__main__":
@@ -51,5 +102,7 @@ if __name__ == "__main__":
     parser.add_argument("--filter", type=str, default="all")
     parser.add_argument("out", type=str, default="reader.cf32", nargs="?")
     args = parser.parse_args()
-    sig = reader_cmd_gen(args.samp_rate, args.filter)
+    sig, table = inventory_script(args.filter).compile(args.samp_rate)
     sig.tofile(args.out)
+    # sidecar table of command offsets, e.g. reader.cf32 -> reader.cmd.npy
+    np.save(os.path.splitext(args.out)[0] + ".cmd.npy", table)
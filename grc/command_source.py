@@ -0,0 +1,63 @@
+import threading
+
+import numpy as np
+from command_gen import reader_cmd_chunks
+from gnuradio import gr
+
+
+class reader_cmd_source(gr.sync_block):
+    """
+    Streams the reader command schedule of `command_gen` in a loop, like a repeating
+    `vector_source_c`, without ever holding the whole schedule in memory.
+    """
+
+    def __init__(self, samp_rate=2e6, tag_filter="all", chunk_size=65536):
+        gr.sync_block.__init__(
+            self, name="Reader Command Source", in_sig=None, out_sig=[np.complex64]
+        )
+        self.chunk_size = chunk_size
+        self._samp_rate = samp_rate
+        self._tag_filter = tag_filter
+        self._lock = threading.Lock()
+        self._restart()
+
+    def _restart(self):
+        self._chunks = reader_cmd_chunks(
+            self._samp_rate, self._tag_filter, self.chunk_size, repeat=None
+        )
+        self._chunk = next(self._chunks)
+        self._pos = 0
+
+    @property
+    def samp_rate(self):
+        return self._samp_rate
+
+    @samp_rate.setter
+    def samp_rate(self, samp_rate):
+        with self._lock:
+            self._samp_rate = samp_rate
+            self._restart()
+
+    @property
+    def tag_filter(self):
+        return self._tag_filter
+
+    @tag_filter.setter
+    def tag_filter(self, tag_filter):
+        with self._lock:
+            self._tag_filter = tag_filter
+            self._restart()
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        n_out = 0
+        with self._lock:
+            while n_out < len(out):
+                if self._pos == len(self._chunk):
+                    self._chunk = next(self._chunks)
+                    self._pos = 0
+                n = min(len(out) - n_out, len(self._chunk) - self._pos)
+                out[n_out : n_out + n] = self._chunk[self._pos : self._pos + n]
+                n_out += n
+                self._pos += n
+        return len(out)
@@ -9,7 +9,6 @@
 # Author: Yachen Mao
 # GNU Radio version: 3.10.10.0
 
-from command_gen import reader_cmd_gen
 from gnuradio import blocks
 from gnuradio import gr
 from gnuradio.filter import firdes
@@ -21,6 +20,7 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+import rfid_query_epy_block_0 as epy_block_0  # embedded python block
 
 
 
@@ -80,7 +80,7 @@ class rfid_query(gr.top_block):
         self.uhd_usrp_sink_0.set_center_freq(freq, 0)
         self.uhd_usrp_sink_0.set_antenna("TX/RX", 0)
         self.uhd_usrp_sink_0.set_gain(tx_gain, 0)
-        self.blocks_vector_source_x_0 = blocks.vector_source_c(reader_cmd_gen(samp_rate, tag_filter), True, 1, [])
+        self.epy_block_0 = epy_block_0.blk(samp_rate=samp_rate, tag_filter=tag_filter)
         self.blocks_head_0_0 = blocks.head(gr.sizeof_gr_complex*1, (int(samp_rate * (duration + 0.2))))
         self.blocks_head_0 = blocks.head(gr.sizeof_gr_complex*1, (int(samp_rate * duration)))
         self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_gr_complex*1, out, False)
@@ -92,7 +92,7 @@ class rfid_query(gr.top_block):
         ##################################################
         self.connect((self.blocks_head_0, 0), (self.blocks_file_sink_0, 0))
         self.connect((self.blocks_head_0_0, 0), (self.uhd_usrp_sink_0, 0))
-        self.connect((self.blocks_vector_source_x_0, 0), (self.blocks_head_0_0, 0))
+        self.connect((self.epy_block_0, 0), (self.blocks_head_0_0, 0))
         self.connect((self.uhd_usrp_source_0, 0), (self.blocks_head_0, 0))
 
 
@@ -132,7 +132,7 @@ class rfid_query(gr.top_block):
 
     def set_tag_filter(self, tag_filter):
         self.tag_filter = tag_filter
-        self.blocks_vector_source_x_0.set_data(reader_cmd_gen(self.samp_rate, self.tag_filter), [])
+        self.epy_block_0.tag_filter = self.tag_filter
 
     def get_tx_gain(self):
         return self.tx_gain
@@ -148,7 +148,7 @@ class rfid_query(gr.top_block):
         self.samp_rate = samp_rate
         self.blocks_head_0.set_length((int(self.samp_rate * self.duration)))
         self.blocks_head_0_0.set_length((int(self.samp_rate * (self.duration + 0.2))))
-        self.blocks_vector_source_x_0.set_data(reader_cmd_gen(self.samp_rate, self.tag_filter), [])
+        self.epy_block_0.samp_rate = self.samp_rate
         self.uhd_usrp_sink_0.set_samp_rate(self.samp_rate)
         self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
 
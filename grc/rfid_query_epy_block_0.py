@@ -0,0 +1,13 @@
+"""
+Reader Command Source
+
+Streams the reader command schedule generated by command_gen in a loop.
+"""
+
+from command_source import reader_cmd_source
+
+
+class blk(reader_cmd_source):
+
+    def __init__(self, samp_rate=2e6, tag_filter='all'):
+        reader_cmd_source.__init__(self, samp_rate, tag_filter)
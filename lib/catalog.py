@@ -0,0 +1,437 @@
+import json
+import os
+import re
+import sqlite3
+import struct
+import warnings
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from dataset import MANIFEST, RN16Dataset, dataset_path
+from utils import arg_outliers, quantiles
+
+Capture = namedtuple(
+    "Capture", ["id", "path", "directory", "pair", "distance", "date", "n_frames", "note"]
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    directory TEXT NOT NULL,
+    pair TEXT,
+    distance REAL,
+    date TEXT,
+    n_frames INTEGER NOT NULL,
+    note TEXT,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_pair_distance ON captures (pair, distance);
+CREATE INDEX IF NOT EXISTS captures_date ON captures (date);
+CREATE TABLE IF NOT EXISTS arrays (
+    capture_id INTEGER NOT NULL REFERENCES captures (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    file TEXT NOT NULL,
+    data_offset INTEGER,
+    dtype TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    PRIMARY KEY (capture_id, name)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    capture_id INTEGER PRIMARY KEY REFERENCES captures (id) ON DELETE CASCADE,
+    n_outliers INTEGER NOT NULL,
+    mag_mean REAL,
+    mag_std REAL,
+    mag_q1 REAL,
+    mag_median REAL,
+    mag_q3 REAL,
+    phase_mean REAL,
+    phase_std REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    capture_id INTEGER NOT NULL REFERENCES captures (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (capture_id, name)
+);
+"""
+
+_CAPTURE_COLUMNS = "id, path, directory, pair, distance, date, n_frames, note"
+
+
+def _npy_data(fp, offset):
+    """Reads the header of the .npy array at `offset`, returns its data offset, dtype and shape."""
+    fp.seek(offset)
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+    return fp.tell(), dtype, shape, fortran_order
+
+
+def _npz_arrays(path):
+    """
+    Finds the arrays of a .npz archive. Uncompressed members get the offset of their data
+    in the archive, so they can be memory-mapped; compressed members get no offset.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as fp:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type == zipfile.ZIP_STORED:
+                fp.seek(info.header_offset + 26)
+                n_name, n_extra = struct.unpack("<HH", fp.read(4))
+                offset, dtype, shape, fortran_order = _npy_data(
+                    fp, info.header_offset + 30 + n_name + n_extra
+                )
+                if fortran_order:
+                    offset = None
+            else:
+                with archive.open(info) as f:
+                    _, dtype, shape, _ = _npy_data(f, 0)
+                offset = None
+            arrays[name] = (path, offset, dtype, shape)
+    return arrays
+
+
+def _dataset_arrays(path):
+    arrays = {}
+    with open(os.path.join(path, MANIFEST)) as f:
+        columns = json.load(f)["columns"]
+    for name, column in columns.items():
+        file = os.path.join(path, column["file"])
+        with open(file, "rb") as fp:
+            offset, dtype, shape, _ = _npy_data(fp, 0)
+        arrays[name] = (file, offset, dtype, shape)
+    return arrays
+
+
+def _capture_date(path, mtime):
+    # collect_data.sh names capture directories after their date, e.g. data/20240613000439
+    for part in reversed(os.path.normpath(os.path.abspath(path)).split(os.sep)):
+        if re.fullmatch(r"\d{14}", part):
+            return datetime.strptime(part, "%Y%m%d%H%M%S").isoformat()
+    return datetime.fromtimestamp(mtime).isoformat(timespec="seconds")
+
+
+def _capture_pair(path):
+    match = re.match(r"(\d+-\d+)", os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def inter_channel_stats(inter_est, m=2):
+    """
+    Summarizes the inter-channel estimates of a capture, after removing the magnitude
+    outliers.
+
+    Args:
+        inter_est (numpy.ndarray): The inter-channel estimates of the frames.
+        m (float, optional): The number of iqrs to consider as the threshold for outliers.
+            Defaults to 2.
+
+    Returns:
+        tuple: The estimates which are not outliers, and a dict with the number of
+        outliers, the mean, standard deviation and quartiles of the magnitude, and the
+        circular mean and standard deviation of the phase.
+    """
+    inter_est = np.asarray(inter_est)
+    outliers = arg_outliers(np.abs(inter_est), m) if len(inter_est) else []
+    filtered = np.delete(inter_est, outliers)
+    stats = {"n_outliers": len(outliers)}
+    if len(filtered):
+        mag = np.abs(filtered)
+        q1, median, q3 = quantiles(mag, (0.25, 0.5, 0.75))
+        resultant = np.mean(np.exp(1j * np.angle(filtered)))
+        stats.update(
+            mag_mean=float(np.mean(mag)),
+            mag_std=float(np.std(mag)),
+            mag_q1=float(q1),
+            mag_median=float(median),
+            mag_q3=float(q3),
+            phase_mean=float(np.angle(resultant)),
+            phase_std=float(np.sqrt(-2 * np.log(max(np.abs(resultant), 1e-300)))),
+        )
+    return filtered, stats
+
+
+class Catalog:
+    """
+    SQLite index of captures and of the results derived from them.
+
+    A capture is a `.npz` archive written by `split_rn16` or an RN16 dataset directory.
+    The catalog records its tag pair, distance, date, frame count and note, the file and
+    data offset of each of its arrays, and the statistics and outlier-filtered estimates of
+    its inter-channel. Adding a capture which did not change since it was indexed does not
+    read it again, so a campaign is loaded with index lookups, and arrays are only read
+    when asked for, memory-mapped from their file when they are stored uncompressed.
+
+    Args:
+        path (str, optional): Path of the SQLite database. Defaults to an in-memory database.
+        m (float, optional): The number of iqrs to consider as the threshold for outliers
+            when a capture is added. Defaults to 2.
+
+    Example:
+        with Catalog("data/catalog.sqlite") as catalog:
+            catalog.scan("data", distances={"20240613000439": 7})
+            for capture in catalog.captures(pair="1-3", min_distance=7, max_distance=11):
+                inter_est = catalog.result(capture, "inter_est_filtered")
+    """
+
+    def __init__(self, path=":memory:", m=2):
+        self.path = path
+        self.m = m
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, path, pair=None, distance=None, date=None, note=None):
+        """
+        Indexes a capture, or updates it if it changed since it was indexed.
+
+        Args:
+            path (str): Path of a `.npz` archive or RN16 dataset directory.
+            pair (str, optional): Tag pair, e.g. "1-2". Defaults to the start of the file name.
+            distance (float, optional): Distance of the tags in cm.
+            date (str, optional): ISO date of the capture. Defaults to the timestamp of the
+                directory name, as written by `collect_data.sh`, or the modification time.
+            note (str, optional): Note about the capture. Defaults to the `note.txt` next to it.
+
+        Returns:
+            Capture: The indexed capture.
+        """
+        path = os.path.abspath(path)
+        stat_path = os.path.join(path, MANIFEST) if os.path.isdir(path) else path
+        stat = os.stat(stat_path)
+        row = self.db.execute(
+            "SELECT id, mtime, size FROM captures WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None and row[1:] == (stat.st_mtime, stat.st_size):
+            updates = {"pair": pair, "distance": distance, "date": date, "note": note}
+            updates = {k: v for k, v in updates.items() if v is not None}
+            if updates:
+                with self.db:
+                    self.db.execute(
+                        f"UPDATE captures SET {', '.join(f'{k} = ?' for k in updates)} "
+                        "WHERE id = ?",
+                        (*updates.values(), row[0]),
+                    )
+            return self.get(row[0])
+
+        arrays = _dataset_arrays(path) if os.path.isdir(path) else _npz_arrays(path)
+        if "inter_est" not in arrays:
+            raise ValueError(f"Invalid capture {path}. Must have an inter_est array.")
+        if os.path.isdir(path):
+            inter_est = RN16Dataset(path)["inter_est"]
+        else:
+            with np.load(path) as data:
+                inter_est = data["inter_est"]
+        directory = os.path.dirname(path)
+        if note is None and os.path.isfile(os.path.join(directory, "note.txt")):
+            with open(os.path.join(directory, "note.txt")) as f:
+                note = f.read().strip()
+        filtered, stats = inter_channel_stats(inter_est, self.m)
+
+        with self.db:
+            if row is not None:
+                self.db.execute("DELETE FROM captures WHERE id = ?", (row[0],))
+            capture_id = self.db.execute(
+                "INSERT INTO captures "
+                "(path, directory, pair, distance, date, n_frames, note, mtime, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    directory,
+                    pair or _capture_pair(path),
+                    distance,
+                    date or _capture_date(path, stat.st_mtime),
+                    len(inter_est),
+                    note,
+                    stat.st_mtime,
+                    stat.st_size,
+                ),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO arrays VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (capture_id, name, file, offset, dtype.str, json.dumps(list(shape)))
+                    for name, (file, offset, dtype, shape) in arrays.items()
+                ],
+            )
+            self.db.execute(
+                f"INSERT INTO stats (capture_id, {', '.join(stats)}) "
+                f"VALUES (?{', ?' * len(stats)})",
+                (capture_id, *stats.values()),
+            )
+            self._store_result(capture_id, "inter_est_filtered", filtered)
+        return self.get(capture_id)
+
+    def scan(self, root, distances=None):
+        """
+        Indexes every capture below a directory. RN16 datasets are indexed instead of the
+        `.npz` archives they were converted from. Files which are not captures, e.g. a
+        `.npz` without inter-channel estimates, are skipped with a warning.
+
+        Args:
+            root (str): Directory to search.
+            distances (dict, optional): Distance in cm of the captures of each directory,
+                by directory name or path.
+
+        Returns:
+            list[Capture]: The indexed captures.
+        """
+        distances = distances or {}
+        captures = []
+        for directory, dirnames, filenames in os.walk(root):
+            paths = [
+                os.path.join(directory, d) for d in dirnames if d.endswith(".rn16")
+            ] + [
+                os.path.join(directory, f)
+                for f in filenames
+                if f.endswith(".npz")
+                and not os.path.isdir(dataset_path(os.path.join(directory, f)))
+            ]
+            distance = distances.get(directory, distances.get(os.path.basename(directory)))
+            for path in sorted(paths):
+                try:
+                    captures.append(self.add(path, distance=distance))
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    warnings.warn(f"Skipping {path}: {e}")
+            dirnames[:] = [d for d in dirnames if not d.endswith(".rn16")]
+        return captures
+
+    def _store_result(self, capture_id, name, array):
+        array = np.ascontiguousarray(array)
+        self.db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (capture_id, name, array.dtype.str, json.dumps(array.shape), array.tobytes()),
+        )
+
+    def store_result(self, capture, name, array):
+        """Stores an array derived from a capture, replacing the previous one."""
+        with self.db:
+            self._store_result(capture.id, name, array)
+
+    def get(self, capture_id):
+        row = self.db.execute(
+            f"SELECT {_CAPTURE_COLUMNS} FROM captures WHERE id = ?", (capture_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No capture {capture_id}")
+        return Capture(*row)
+
+    def _where(
+        self,
+        pair=None,
+        min_distance=None,
+        max_distance=None,
+        since=None,
+        until=None,
+        directory=None,
+    ):
+        if directory is not None:
+            directory = os.path.abspath(directory)
+        conditions = {
+            "pair IN ({})": pair,
+            "directory = ?": directory,
+            "distance >= ?": min_distance,
+            "distance <= ?": max_distance,
+            "date >= ?": since,
+            "date <= ?": until,
+        }
+        clauses, params = [], []
+        for clause, value in conditions.items():
+            if value is None:
+                continue
+            if clause.startswith("pair"):
+                pairs = [value] if isinstance(value, str) else list(value)
+                clause = clause.format(", ".join("?" * len(pairs)))
+                params.extend(pairs)
+            else:
+                params.append(value)
+            clauses.append(clause)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def captures(self, **query):
+        """
+        Finds captures, ordered by distance, pair and date.
+
+        Args:
+            pair (str or list[str], optional): Tag pair(s), e.g. "1-3".
+            min_distance (float, optional): Minimum distance in cm.
+            max_distance (float, optional): Maximum distance in cm.
+            since (str, optional): Minimum ISO date.
+            until (str, optional): Maximum ISO date.
+            directory (str, optional): Directory containing the captures.
+
+        Returns:
+            list[Capture]: The matching captures.
+        """
+        where, params = self._where(**query)
+        rows = self.db.execute(
+            f"SELECT {_CAPTURE_COLUMNS} FROM captures{where} ORDER BY distance, pair, date",
+            params,
+        )
+        return [Capture(*row) for row in rows]
+
+    def summary(self, **query):
+        """
+        Returns the statistics of the captures matching a query, see `captures`, as a list of
+        dicts which can be passed to `pandas.DataFrame`.
+        """
+        where, params = self._where(**query)
+        cursor = self.db.execute(
+            "SELECT pair, distance, date, n_frames, path, stats.* FROM captures "
+            f"JOIN stats ON stats.capture_id = captures.id{where} "
+            "ORDER BY distance, pair, date",
+            params,
+        )
+        names = [d[0] for d in cursor.description]
+        return [
+            {k: v for k, v in zip(names, row) if k != "capture_id"} for row in cursor
+        ]
+
+    def array(self, capture, name):
+        """
+        Returns an array of a capture, memory-mapped read-only when it is stored
+        uncompressed and loaded otherwise.
+        """
+        row = self.db.execute(
+            "SELECT file, data_offset, dtype, shape FROM arrays WHERE capture_id = ? AND name = ?",
+            (capture.id, name),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{name} is not an array of {capture.path}")
+        file, offset, dtype, shape = row
+        shape = tuple(json.loads(shape))
+        if offset is None:
+            with np.load(file) as data:
+                return data[name]
+        if np.prod(shape) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def result(self, capture, name):
+        """Returns an array derived from a capture, e.g. "inter_est_filtered"."""
+        row = self.db.execute(
+            "SELECT dtype, shape, data FROM results WHERE capture_id = ? AND name = ?",
+            (capture.id, name),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{name} is not a result of {capture.path}")
+        dtype, shape, data = row
+        return np.frombuffer(data, dtype=dtype).reshape(json.loads(shape))
@@ -0,0 +1,160 @@
+"""
+CRC-5/EPC-C1G2 and CRC-16/GENIBUS as specified by EPC Gen2.
+
+The functions mirror the `epc_crc` extension and are taken from it when it is built.
+Otherwise byte-wise lookup tables are used, vectorized with NumPy across rows.
+"""
+
+import numpy as np
+
+try:
+    import epc_crc
+except ImportError:
+    epc_crc = None
+
+# Register contents after running CRC-16/GENIBUS over a message followed by its own CRC.
+CRC16_RESIDUE = 0x1D0F
+
+
+def _crc_table(width, poly):
+    # the register is kept left-aligned in max(width, 8) bits
+    reg_width = max(width, 8)
+    top = 1 << (reg_width - 1)
+    mask = (1 << reg_width) - 1
+    poly <<= reg_width - width
+    table = []
+    for byte in range(256):
+        crc = byte << (reg_width - 8)
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly if crc & top else crc << 1) & mask
+        table.append(crc)
+    return table
+
+
+class _CRC:
+
+    def __init__(self, width, poly, init, xorout, dtype):
+        self.width = width
+        self.poly = poly
+        self.init = init
+        self.xorout = xorout
+        self.dtype = dtype
+        self.reg_width = max(width, 8)
+        self.table = _crc_table(width, poly)
+        self.table_np = np.array(self.table, dtype=np.uint32)
+
+    def __call__(self, data: bytes, n_bits: int) -> int:
+        """
+        Computes the CRC of the first `n_bits` bits of `data`, MSB first.
+        """
+        reg_width = self.reg_width
+        shift = reg_width - self.width
+        top = 1 << (reg_width - 1)
+        mask = (1 << reg_width) - 1
+        table = self.table
+        crc = self.init << shift
+        n_byte, n_rem = divmod(n_bits, 8)
+        for byte in data[:n_byte]:
+            crc = ((crc << 8) & mask) ^ table[(crc >> (reg_width - 8)) ^ byte]
+        if n_rem:
+            crc ^= (data[n_byte] & (0xFF00 >> n_rem)) << (reg_width - 8)
+            poly = self.poly << shift
+            for _ in range(n_rem):
+                crc = ((crc << 1) ^ poly if crc & top else crc << 1) & mask
+        return (crc >> shift) ^ self.xorout
+
+    def rows(self, data: np.ndarray, n_bits: int) -> np.ndarray:
+        """
+        Computes the CRC of the first `n_bits` bits of every row of a 2-D packed array.
+        """
+        reg_width = self.reg_width
+        shift = reg_width - self.width
+        top = 1 << (reg_width - 1)
+        mask = (1 << reg_width) - 1
+        n_byte, n_rem = divmod(n_bits, 8)
+        crc = np.full(data.shape[0], self.init << shift, dtype=np.uint32)
+        for j in range(n_byte):
+            crc = ((crc << 8) & mask) ^ self.table_np[(crc >> (reg_width - 8)) ^ data[:, j]]
+        if n_rem:
+            crc ^= (data[:, n_byte].astype(np.uint32) & (0xFF00 >> n_rem)) << (
+                reg_width - 8
+            )
+            poly = self.poly << shift
+            for _ in range(n_rem):
+                crc = np.where(crc & top, (crc << 1) ^ poly, crc << 1) & mask
+        return ((crc >> shift) ^ self.xorout).astype(self.dtype)
+
+    def packed(self, data, n_bits: int):
+        data = _as_bytes(data)
+        if n_bits > data.shape[-1] * 8:
+            raise ValueError("n_bits exceeds the length of the buffer.")
+        if data.ndim == 1:
+            return self(data.tobytes(), n_bits)
+        return self.rows(data, n_bits)
+
+    def bits(self, bits):
+        bits = _as_bytes(bits)
+        return self.packed(np.packbits(bits != 0, axis=-1), bits.shape[-1])
+
+    def check(self, data, n_bits: int) -> np.ndarray:
+        data = _as_bytes(data)
+        if n_bits > data.shape[-1] * 8:
+            raise ValueError("n_bits exceeds the length of the buffer.")
+        if n_bits < self.width:
+            raise ValueError("Frames must be at least 16 bits long.")
+        return self.rows(np.atleast_2d(data), n_bits) ^ self.xorout == CRC16_RESIDUE
+
+
+def _as_bytes(data) -> np.ndarray:
+    # the same buffers as `epc_crc`: 1-D or 2-D, with 1-byte items such as uint8 or bool
+    if isinstance(data, (bytes, bytearray)):
+        data = np.frombuffer(data, dtype=np.uint8)
+    data = np.asarray(data)
+    if data.dtype.itemsize != 1:
+        raise ValueError("Expected a buffer of uint8 items.")
+    if data.ndim not in (1, 2):
+        raise ValueError("Expected a 1-D or 2-D buffer.")
+    return data.view(np.uint8)
+
+
+_crc5 = _CRC(5, 0x09, 0x09, 0x00, np.uint8)
+_crc16 = _CRC(16, 0x1021, 0xFFFF, 0xFFFF, np.uint16)
+
+
+def _to_bits(crc, width):
+    return [crc >> (width - 1 - i) & 1 for i in range(width)]
+
+
+def _crc5_list(bits: list[int]) -> list[int]:
+    return _to_bits(_crc5.bits(np.asarray(bits, dtype=np.uint8)), 5)
+
+
+def _crc16_list(bits: list[int]) -> list[int]:
+    return _to_bits(_crc16.bits(np.asarray(bits, dtype=np.uint8)), 16)
+
+
+def _check_crc16(bits) -> np.ndarray:
+    bits = _as_bytes(bits)
+    return _crc16.check(np.packbits(bits != 0, axis=-1), bits.shape[-1])
+
+
+if epc_crc is not None:
+    from epc_crc import (
+        check_crc16,
+        check_crc16_packed,
+        crc5,
+        crc5_bits,
+        crc5_packed,
+        crc16,
+        crc16_bits,
+        crc16_packed,
+    )
+else:
+    crc5 = _crc5_list
+    crc16 = _crc16_list
+    crc5_packed = _crc5.packed
+    crc16_packed = _crc16.packed
+    crc5_bits = _crc5.bits
+    crc16_bits = _crc16.bits
+    check_crc16 = _check_crc16
+    check_crc16_packed = _crc16.check
@@ -0,0 +1,198 @@
+import json
+import os
+import zipfile
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+VERSION = 1
+DTYPES = {
+    "frames": np.complex64,
+    "frames_dc": np.complex64,
+    "labels": np.int8,
+    "inter_est": np.complex64,
+    "offsets": np.uint64,
+}
+
+
+class RN16Dataset:
+    """
+    RN16 frames stored column by column, one uncompressed `.npy` file per column
+    (`frames`, `frames_dc`, `labels`, `inter_est` and, when known, the sample `offsets`
+    of the frames) and a `manifest.json` describing them.
+
+    Columns are memory-mapped read-only the first time they are accessed, so opening a
+    dataset only reads the manifest and a script only touches the bytes it uses. Like the
+    `.npz` archives of `split_rn16`, columns are read with `dataset["inter_est"]`.
+
+    Args:
+        path (str): Directory of the dataset.
+
+    Example:
+        with RN16Dataset("data/20240613000439/1-2.rn16") as data:
+            inter_est = data["inter_est"]
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != VERSION:
+            raise ValueError(
+                f"Invalid dataset version {self.manifest.get('version')}. Must be {VERSION}."
+            )
+        self._columns = {}
+
+    @property
+    def files(self):
+        return list(self.manifest["columns"])
+
+    @property
+    def metadata(self):
+        return self.manifest.get("metadata", {})
+
+    def __len__(self):
+        return self.manifest["n_frames"]
+
+    def __contains__(self, key):
+        return key in self.manifest["columns"]
+
+    def __getitem__(self, key):
+        if key not in self._columns:
+            if key not in self:
+                raise KeyError(f"{key} is not a column of {self.path}")
+            file = self.manifest["columns"][key]["file"]
+            self._columns[key] = np.load(os.path.join(self.path, file), mmap_mode="r")
+        return self._columns[key]
+
+    def close(self):
+        self._columns.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _write_manifest(path, columns, metadata):
+    n_frames = {column["shape"][0] for column in columns.values()}
+    if len(n_frames) > 1:
+        raise ValueError("Invalid columns. Must all have the same number of frames.")
+    manifest = {
+        "version": VERSION,
+        "n_frames": n_frames.pop() if n_frames else 0,
+        "columns": columns,
+        "metadata": metadata or {},
+    }
+    # the manifest is written last and atomically, a dataset is never opened half written
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+
+def _column_info(name, array):
+    return {"file": f"{name}.npy", "dtype": array.dtype.str, "shape": list(array.shape)}
+
+
+def write_dataset(path, metadata=None, **columns):
+    """
+    Writes arrays as an RN16 dataset.
+
+    Args:
+        path (str): Directory of the dataset, created if needed.
+        metadata (dict, optional): JSON-serializable information stored in the manifest.
+        **columns (numpy.ndarray): Columns indexed by frame along the first axis, e.g.
+            `frames`, `frames_dc`, `labels`, `inter_est` and `offsets`. The known columns
+            are converted to their dataset dtype, e.g. `labels` to int8.
+
+    Returns:
+        RN16Dataset: The dataset written.
+    """
+    os.makedirs(path, exist_ok=True)
+    info = {}
+    for name, array in columns.items():
+        array = np.asarray(array, dtype=DTYPES.get(name))
+        np.save(os.path.join(path, f"{name}.npy"), array)
+        info[name] = _column_info(name, array)
+    _write_manifest(path, info, metadata)
+    return RN16Dataset(path)
+
+
+def dataset_path(npz_path):
+    """Returns the dataset directory used for a `.npz` archive, `x.npz` -> `x.rn16`."""
+    return os.path.splitext(npz_path)[0] + ".rn16"
+
+
+def convert_npz(npz_path, path=None, metadata=None, chunk_rows=4096):
+    """
+    Converts a `.npz` archive written by `split_rn16` to an RN16 dataset.
+
+    Members are copied `chunk_rows` frames at a time, so archives larger than the memory
+    can be converted. Members which are not dataset columns are copied as they are.
+
+    Args:
+        npz_path (str): Path of the `.npz` archive.
+        path (str, optional): Directory of the dataset. Defaults to `dataset_path(npz_path)`.
+        metadata (dict, optional): JSON-serializable information stored in the manifest.
+        chunk_rows (int, optional): Number of frames copied at a time. Defaults to 4096.
+
+    Returns:
+        RN16Dataset: The converted dataset.
+    """
+    path = path or dataset_path(npz_path)
+    os.makedirs(path, exist_ok=True)
+    info = {}
+    with zipfile.ZipFile(npz_path) as archive:
+        for member in archive.namelist():
+            name = member.removesuffix(".npy")
+            with archive.open(member) as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(f)
+                else:
+                    header = np.lib.format.read_array_header_2_0(f)
+                shape, fortran_order, dtype = header
+                if fortran_order or not shape:
+                    raise ValueError(
+                        f"Invalid member {member}. Must be a C-ordered array of frames."
+                    )
+                out = np.lib.format.open_memmap(
+                    os.path.join(path, f"{name}.npy"),
+                    mode="w+",
+                    dtype=DTYPES.get(name, dtype),
+                    shape=shape,
+                )
+                n_rows = shape[0]
+                row_size = int(np.prod(shape[1:], dtype=np.int64))
+                flat = out.reshape(n_rows, row_size)
+                for start in range(0, n_rows, chunk_rows):
+                    n = min(chunk_rows, n_rows - start)
+                    data = f.read(n * row_size * dtype.itemsize)
+                    flat[start : start + n] = np.frombuffer(data, dtype=dtype).reshape(
+                        n, row_size
+                    )
+                info[name] = _column_info(name, out)
+                out.flush()
+                del flat, out
+    _write_manifest(path, info, metadata)
+    return RN16Dataset(path)
+
+
+def open_rn16(path):
+    """
+    Opens RN16 frames, from a dataset directory or a `.npz` archive. For an archive
+    `x.npz` which was converted to `x.rn16`, the dataset is opened instead.
+
+    Args:
+        path (str): Dataset directory or `.npz` archive.
+
+    Returns:
+        RN16Dataset or numpy.lib.npyio.NpzFile: Columns indexed by name.
+    """
+    if path.endswith(".npz") and os.path.isdir(dataset_path(path)):
+        path = dataset_path(path)
+    if os.path.isdir(path):
+        return RN16Dataset(path)
+    return np.load(path)
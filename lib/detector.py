@@ -0,0 +1,189 @@
+from collections import namedtuple
+
+import numpy as np
+from utils import FM0_PREAMBLE, _iter_chunks
+
+RN16Frame = namedtuple("RN16Frame", ["start", "frame", "dc", "dc_est", "h_est"])
+
+
+class RN16Detector:
+    """
+    Streaming RN16 detector, a NumPy port of the `rfid_block` GNU Radio block.
+
+    A reader command is a run of more than `min_pulses` consecutive low pulses longer
+    than half a pulse width. Once the carrier has stayed high for more than `n_t1`
+    samples after the last pulse, the DC is estimated from the last `n_t1 / 2` samples,
+    the RN16 preamble is searched among `n_corr` offsets by correlation and `h_est` is
+    averaged from the middle of the high preamble symbols. As in `rfid_block`, the frame
+    starts one sample after the best correlation offset, and the sample following a
+    frame is skipped.
+
+    Each chunk is scanned per level run rather than per sample: edges are found with
+    run-length encoding and the pulse counts with cumulative sums.
+
+    Args:
+        threshold (float, optional): Amplitude below which the carrier is low. Defaults to 0.04.
+        min_pulses (int, optional): Minimum number of pulses of a reader command. Defaults to 5.
+        n_pulse_width (int, optional): Number of samples of a reader pulse. Defaults to 24.
+        n_t1 (int, optional): Number of samples between a command and the reply. Defaults to 460.
+        n_frame (int, optional): Number of samples of an RN16 frame. Defaults to 1150.
+        sps (int, optional): Number of samples per FM0 symbol. Defaults to 25.
+        n_corr (int, optional): Number of preamble offsets searched. Defaults to 100.
+
+    Example:
+        detector = RN16Detector()
+        for chunk in chunks:
+            for rn16 in detector.feed(chunk):
+                print(rn16.start, rn16.h_est)
+    """
+
+    def __init__(
+        self,
+        threshold=0.04,
+        min_pulses=5,
+        n_pulse_width=24,
+        n_t1=460,
+        n_frame=1150,
+        sps=25,
+        n_corr=100,
+    ):
+        self.threshold = threshold
+        self.min_pulses = min_pulses
+        self.n_pulse_width = n_pulse_width
+        self.n_t1 = n_t1
+        self.n_frame = n_frame
+        self.sps = sps
+        self.n_corr = n_corr
+        self.n_dc = n_t1 // 2
+        self._preamble = np.repeat(FM0_PREAMBLE, sps).astype(np.complex64)
+        self._ones = np.flatnonzero(np.array(FM0_PREAMBLE) == 1) * sps + sps // 2
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state, as if no sample had been fed.
+        """
+        self._buffer = np.empty(0, dtype=np.complex64)
+        self._base = 0  # absolute index of the first buffered sample
+        self._pos = 0  # absolute index of the next sample to scan
+        self._high = True
+        self._pulse_count = 0
+        self._edge = -1  # absolute index of the last edge
+        self._trigger = None  # absolute index of the sample that ended the command
+
+    def feed(self, chunk):
+        """
+        Processes the next chunk of samples.
+
+        Args:
+            chunk (np.ndarray): The next complex64 samples of the stream.
+
+        Returns:
+            list: The `RN16Frame`s completed by this chunk, with the absolute index of the
+                first frame sample, the frame, the DC samples, `dc_est` and `h_est`.
+        """
+        self._buffer = np.concatenate(
+            (self._buffer, np.asarray(chunk, dtype=np.complex64))
+        )
+        end = self._base + len(self._buffer)
+        frames = []
+        while True:
+            if self._trigger is None:
+                self._trigger = self._seek(end)
+                if self._trigger is None:
+                    break
+            rn16 = self._sync(end)
+            if rn16 is None:
+                break
+            frames.append(rn16)
+
+        # keep the DC history of the next trigger, or the samples of the pending frame
+        keep = self._pos - self.n_dc if self._trigger is None else self._trigger - self.n_dc + 1
+        keep = max(keep, self._base)
+        self._buffer = self._buffer[keep - self._base :]
+        self._base = keep
+        return frames
+
+    def _seek(self, end):
+        # Scans [self._pos, end) for the end of a reader command. Within a high run the
+        # carrier has been high for `sample - edge` samples, so the first candidate of the
+        # run is `edge + n_t1 + 1`, valid if the run lasts until then.
+        x = self._buffer[self._pos - self._base :]
+        high = np.abs(x) > self.threshold
+        prev = np.concatenate(([self._high], high[:-1]))
+        edges = np.flatnonzero(high != prev) + self._pos
+        rising = high[edges - self._pos]
+
+        # pulse count after every rising edge: +1 for a long low pulse, reset otherwise
+        anchors = np.concatenate(([self._edge], edges))
+        low_len = edges[rising] - anchors[:-1][rising]
+        long_pulse = low_len > self.n_pulse_width // 2
+        n_long = np.cumsum(long_pulse)
+        reset = np.maximum.accumulate(
+            np.where(long_pulse, -1, np.arange(len(long_pulse)))
+        )
+        counts = np.where(
+            reset >= 0,
+            n_long - n_long[np.maximum(reset, 0)],
+            self._pulse_count + n_long,
+        )
+
+        # high runs start at a rising edge, or continue from before the chunk
+        run_start = edges[rising]
+        run_count = counts
+        run_end = np.concatenate((edges, [end]))[1:][rising]
+        if self._high:
+            run_start = np.concatenate(([self._edge], run_start))
+            run_count = np.concatenate(([self._pulse_count], run_count))
+            run_end = np.concatenate(([edges[0] if len(edges) else end], run_end))
+        candidates = run_start + self.n_t1 + 1
+        valid = (candidates < run_end) & (run_count > self.min_pulses)
+        if np.any(valid):
+            return candidates[np.argmax(valid)]
+
+        self._pos = end
+        if len(edges):
+            self._edge = edges[-1]
+            self._high = bool(high[-1])
+        if len(counts):
+            self._pulse_count = counts[-1]
+        return None
+
+    def _sync(self, end):
+        # the frame samples follow the trigger sample
+        t = self._trigger
+        n_sync = len(self._preamble) + self.n_corr - 1
+        if end < t + 1 + n_sync:
+            return None
+        x = self._buffer[t + 1 - self._base :]
+        dc = self._buffer[t + 1 - self.n_dc - self._base : t + 1 - self._base]
+        dc_est = np.mean(dc)
+        corr = np.abs(np.correlate(x[:n_sync] - dc_est, self._preamble, "valid"))
+        start_index = np.argmax(corr) + 1 if np.max(corr) > 0 else 0
+        # the sample after the frame is consumed without being used
+        if end < t + 1 + start_index + self.n_frame + 1:
+            return None
+        h_est = np.mean(x[start_index + self._ones])
+        frame = x[start_index : start_index + self.n_frame]
+
+        self._pos = t + 1 + start_index + self.n_frame + 1
+        self._edge = self._pos - 1
+        self._high = True
+        self._pulse_count = 0
+        self._trigger = None
+        return RN16Frame(t + 1 + start_index, frame.copy(), dc.copy(), dc_est, h_est)
+
+
+def detect_rn16_frames(sig, chunk_size=1 << 20, **kwargs):
+    """
+    Yields the `RN16Frame`s of a whole capture, see `RN16Detector`.
+
+    Args:
+        sig (str | os.PathLike | np.ndarray | iterable): A complex64 capture file, which is
+            memory-mapped, an array or an iterable of complex64 chunks.
+        chunk_size (int, optional): Number of samples read at a time.
+        **kwargs: The parameters of `RN16Detector`.
+    """
+    detector = RN16Detector(**kwargs)
+    for chunk in _iter_chunks(sig, chunk_size):
+        yield from detector.feed(chunk)
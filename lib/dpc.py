@@ -1,21 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+from scipy import signal
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import pdist
 from sklearn.base import BaseEstimator, ClusterMixin
 
 
 class DPC(ClusterMixin, BaseEstimator):
-    def __init__(self, n_clusters, dc=None, filter_halo=False):
+    """
+    Density peaks clustering of complex (IQ) samples.
+
+    Parameters:
+    - n_clusters (int): Number of clusters.
+    - dc (float, optional): The cutoff distance. Estimated from the data if None.
+    - filter_halo (bool): Label points whose delta exceeds `dc` as noise (-1).
+    - algorithm (str): "exact" computes the full N x N distance matrix. "blocked" gives
+      the same results while computing distances in row blocks of at most `max_memory`
+      bytes, and finds deltas with a k-d tree in O(N log N). "grid" bins the points onto
+      an adaptive 2-D grid of cell size h and computes densities by convolving the
+      histogram with the Gaussian kernel, in O(N + grid) memory.
+    - grid_resolution (float): Cells per `dc` along each axis in grid mode.
+    - max_bins (int): Maximum number of cells along each axis in grid mode.
+    - max_memory (int): Memory cap in bytes for the distance blocks in blocked mode.
+    - dtype (numpy.dtype, optional): Float precision of the distances in blocked mode, e.g.
+      `np.float32`. Defaults to the precision of X.
+    - warm_start (bool): Seed `fit` with the centers of the previous fit, see below.
+    - max_drift (float): Maximum distance, in units of `dc`, a center may move in a
+      warm-started fit.
+    - max_outliers (float): Maximum fraction of points outside the cluster radii in a
+      warm-started fit.
+
+    In grid mode every point is moved to its cell center, at most h / sqrt(2) away, so
+    each pairwise distance is off by at most sqrt(2) h. As the kernel exp(-(d / dc)^2)
+    has a slope of at most 0.86 / dc, and it is truncated at 4 dc, the densities satisfy
+
+        |rho_grid - rho_exact| <= (N - 1) * (1.22 * h / dc + exp(-16))
+
+    i.e. about 0.3 (N - 1) at the default h = dc / 4. Deltas are distances between cell
+    centers, within sqrt(2) h of the distance between the corresponding points, and
+    points sharing a cell share their density, delta and label.
+
+    After a full fit, `radii_` holds the distance from every center to its farthest
+    member, not counting the halo if `filter_halo` is set. `predict` assigns points to
+    the nearest center, and labels points beyond that center's radius as noise (-1) if
+    `filter_halo` is set. With `warm_start`, a fit following a previous one assigns
+    the points to the previous centers in O(N k), moves every center to the member
+    closest to the cluster mean and reassigns. It falls back to a full fit if a cluster
+    ends up empty, a center moves more than `max_drift` dc or more than `max_outliers`
+    of the points fall outside the radii. Warm-started fits keep the cluster order and
+    the radii and leave `rhos_` and `deltas_` as None; `warm_started_` tells which kind
+    of fit was made.
+    """
+
+    def __init__(
+        self,
+        n_clusters,
+        dc=None,
+        filter_halo=False,
+        algorithm="exact",
+        grid_resolution=4,
+        max_bins=1024,
+        max_memory=2**28,
+        dtype=None,
+        warm_start=False,
+        max_drift=1.0,
+        max_outliers=0.05,
+    ):
         self.n_clusters = n_clusters
         self.dc = dc
         self.filter_halo = filter_halo
+        self.algorithm = algorithm
+        self.grid_resolution = grid_resolution
+        self.max_bins = max_bins
+        self.max_memory = max_memory
+        self.dtype = dtype
+        self.warm_start = warm_start
+        self.max_drift = max_drift
+        self.max_outliers = max_outliers
 
     def estimate_dc(self):
         n = np.shape(self.dists_)[0]
         tt = np.reshape(self.dists_, n * n)
         position = int(n * (n - 1) * 0.02)
-        dc = np.sort(tt)[position + n]
+        dc = np.partition(tt, position + n)[position + n]
         return dc
 
     def fit(self, X):
+        X = np.asarray(X)
+        if self.warm_start and hasattr(self, "radii_") and self._fit_warm(X):
+            self.warm_started_ = True
+            return self
+        if self.algorithm == "grid":
+            self._fit_grid(X)
+        elif self.algorithm == "blocked":
+            self._fit_blocked(X)
+        elif self.algorithm == "exact":
+            self._fit_exact(X)
+        else:
+            raise ValueError(
+                "Invalid algorithm value. Must be either 'exact', 'blocked' or 'grid'."
+            )
+        dists = np.abs(X - self.cluster_centers_[np.maximum(self.labels_, 0)])
+        self.radii_ = np.zeros(self.n_clusters, dtype=dists.dtype)
+        np.maximum.at(self.radii_, self.labels_[self.labels_ >= 0], dists[self.labels_ >= 0])
+        self.warm_started_ = False
+        return self
+
+    def _assign(self, X, centers):
+        # nearest center of every point and the distance to it
+        dists = np.abs(X[:, np.newaxis] - centers)
+        labels = np.argmin(dists, axis=1)
+        return labels, dists[np.arange(len(X)), labels]
+
+    def _fit_warm(self, X):
+        labels, _ = self._assign(X, self.cluster_centers_)
+        counts = np.bincount(labels, minlength=self.n_clusters)
+        if np.any(counts == 0):
+            return False
+        # move every center to the member closest to the cluster mean
+        means = np.bincount(labels, X.real, self.n_clusters) / counts + 1j * (
+            np.bincount(labels, X.imag, self.n_clusters) / counts
+        )
+        dists = np.abs(X - means[labels])
+        order = np.lexsort((dists, labels))
+        index_centers = order[np.searchsorted(labels[order], np.arange(self.n_clusters))]
+        drift = np.abs(X[index_centers] - self.cluster_centers_)
+        if np.any(drift > self.max_drift * self.dc):
+            return False
+
+        labels, dists = self._assign(X, X[index_centers])
+        labels[index_centers] = np.arange(self.n_clusters)
+        outside = dists > self.radii_[labels]
+        if np.mean(outside) > self.max_outliers:
+            return False
+        if self.filter_halo:
+            labels[outside] = -1
+        self.index_centers_ = index_centers
+        self.cluster_centers_ = X[index_centers]
+        self.labels_ = labels
+        self.rhos_ = None
+        self.deltas_ = None
+        return True
+
+    def predict(self, X):
+        """
+        Assigns points to the nearest fitted center.
+
+        Parameters:
+        - X (ndarray): The complex samples.
+
+        Returns:
+        - labels (ndarray): The cluster of every point, or -1 for points beyond the radius
+          of their cluster if `filter_halo` is set.
+        """
+        X = np.asarray(X)
+        labels, dists = self._assign(X, self.cluster_centers_)
+        if self.filter_halo:
+            labels[dists > self.radii_[labels]] = -1
+        return labels
+
+    def _fit_exact(self, X):
         N = X.shape[0]
         # calc distance matrix
         self.dists_ = np.abs(X[:, np.newaxis] - X)
@@ -53,6 +198,342 @@ class DPC(ClusterMixin, BaseEstimator):
                 self.labels_[center] = i
         return self
 
+    def _blocks(self, X):
+        # distances of row blocks, within the memory cap
+        N = len(X)
+        row_bytes = N * (X.itemsize + 2 * X.real.itemsize)
+        n_rows = max(1, self.max_memory // row_bytes)
+        for i in range(0, N, n_rows):
+            yield i, np.abs(X[i : i + n_rows, np.newaxis] - X)
+
+    def _kth_distance(self, X, k):
+        # bracket the k-th smallest of all N x N distances with a sample of rows, then
+        # count the distances below the bracket and select inside it exactly
+        N = len(X)
+        rng = np.random.default_rng(0)
+        rows = rng.choice(N, min(N, 256), replace=False)
+        sample = np.abs(X[rows, np.newaxis] - X)
+        q = k / N**2
+        lo, hi = np.quantile(sample, [max(q - 0.01, 0), min(q + 0.01, 1)])
+        while True:
+            n_below = 0
+            inside = []
+            for _, dists in self._blocks(X):
+                n_below += np.count_nonzero(dists < lo)
+                inside.append(dists[(dists >= lo) & (dists <= hi)])
+            inside = np.concatenate(inside)
+            if n_below <= k < n_below + len(inside):
+                return np.partition(inside, k - n_below)[k - n_below]
+            if k < n_below:
+                lo = 0
+            else:
+                hi = np.inf
+
+    def _fit_blocked(self, X):
+        X = np.asarray(X)
+        if self.dtype is not None:
+            X = X.astype(np.result_type(self.dtype, np.complex64))
+        N = X.shape[0]
+        if self.dc is None:
+            self.dc = self._kth_distance(X, int(N * (N - 1) * 0.02) + N)
+
+        # calc local density using gaussian kernel
+        self.rhos_ = np.empty(N, dtype=X.real.dtype)
+        for i, dists in self._blocks(X):
+            self.rhos_[i : i + len(dists)] = (
+                np.sum(np.exp(-((dists / self.dc) ** 2)), axis=1) - 1
+            )
+
+        # calc delta and nearest neighbor among the k nearest points, which contain a
+        # point of higher density for all but a few points
+        ordrho = np.argsort(-self.rhos_)
+        rank = np.empty(N, dtype=np.intp)
+        rank[ordrho] = np.arange(N)
+        points = np.column_stack((X.real, X.imag)).astype(np.float64)
+        dists64, neighbors = cKDTree(points).query(points, k=min(N, 16))
+        higher = rank[neighbors] < rank[:, np.newaxis]
+        found = higher.any(axis=1)
+        first = np.argmax(higher, axis=1)
+        # candidates within rounding of the first higher point, in the precision of X
+        bound = dists64[np.arange(N), first] * (1 + 1e-5)
+        candidates = higher & (dists64 <= bound[:, np.newaxis])
+        found &= dists64[:, -1] > bound
+        dists = np.where(candidates, np.abs(X[:, np.newaxis] - X[neighbors]), np.inf)
+        self.deltas_ = np.zeros(N)
+        nearest_neighbors = np.zeros(N, dtype=np.intp)
+        self.deltas_[found], nearest_neighbors[found] = self._nearest_higher(
+            dists[found], neighbors[found], rank
+        )
+
+        # the remaining points search all points of higher density
+        rest = np.flatnonzero(~found & (rank > 0))
+        n_rows = max(1, self.max_memory // (N * (X.itemsize + X.real.itemsize + 8)))
+        for i in range(0, len(rest), n_rows):
+            p = rest[i : i + n_rows]
+            dists = np.abs(X[p, np.newaxis] - X)
+            dists[rank[p, np.newaxis] <= rank] = np.inf
+            all_points = np.broadcast_to(np.arange(N), dists.shape)
+            self.deltas_[p], nearest_neighbors[p] = self._nearest_higher(
+                dists, all_points, rank
+            )
+        # set delta of the point with highest density to the maximum delta
+        self.deltas_[ordrho[0]] = np.max(self.deltas_)
+
+        self.index_centers_ = np.argsort(-self.rhos_ * self.deltas_)[: self.n_clusters]
+        self.labels_ = np.full(N, -1, dtype=np.intp)
+        self.cluster_centers_ = X[self.index_centers_]
+
+        self.labels_[self.index_centers_] = np.arange(self.n_clusters)
+        for i, index in enumerate(ordrho):
+            if self.labels_[index] == -1:
+                self.labels_[index] = self.labels_[nearest_neighbors[index]]
+        if self.filter_halo:
+            self.labels_[self.deltas_ > self.dc] = -1
+            for i, center in enumerate(self.index_centers_):
+                self.labels_[center] = i
+        return self
+
+    @staticmethod
+    def _nearest_higher(dists, neighbors, rank):
+        # the closest point, ties going to the higher density like `np.argmin` in `fit`
+        deltas = np.min(dists, axis=1)
+        ties = np.where(dists == deltas[:, np.newaxis], rank[neighbors], len(rank))
+        return deltas, neighbors[np.arange(len(dists)), np.argmin(ties, axis=1)]
+
+    def _sample_dc(self, points, n_sample=1000):
+        # 2% quantile of the pairwise distances of a random sample
+        if len(points) > n_sample:
+            rng = np.random.default_rng(0)
+            points = points[rng.choice(len(points), n_sample, replace=False)]
+        dists = pdist(points)
+        return np.partition(dists, int(len(dists) * 0.02))[int(len(dists) * 0.02)]
+
+    def _fit_grid(self, X):
+        X = np.asarray(X)
+        points = np.column_stack((X.real, X.imag)).astype(np.float64)
+        if self.dc is None:
+            self.dc = self._sample_dc(points)
+
+        # bin the points onto the grid
+        lo = points.min(axis=0)
+        span = np.max(points.max(axis=0) - lo)
+        h = max(self.dc / self.grid_resolution, span / self.max_bins) or 1.0
+        cells = np.floor((points - lo) / h).astype(np.intp)
+        shape = tuple(cells.max(axis=0) + 1)
+        occupied, inverse, counts = np.unique(
+            np.ravel_multi_index(cells.T, shape), return_inverse=True, return_counts=True
+        )
+        hist = np.zeros(shape)
+        hist.flat[occupied] = counts
+
+        # local density of every occupied cell
+        r = int(np.ceil(4 * self.dc / h))
+        offsets = np.arange(-r, r + 1) * h
+        kernel = np.exp(-(offsets[:, np.newaxis] ** 2 + offsets**2) / self.dc**2)
+        density = signal.fftconvolve(hist, kernel, mode="same")
+        rhos = density.flat[occupied] - 1
+
+        # delta and nearest neighbor with higher density of every occupied cell
+        M = len(occupied)
+        coords = np.column_stack(np.unravel_index(occupied, shape))
+        ordrho = np.argsort(-rhos, kind="stable")
+        rank = np.empty(M, dtype=np.intp)
+        rank[ordrho] = np.arange(M)
+        cell_index = np.full(shape, -1, dtype=np.intp)
+        cell_index.flat[occupied] = np.arange(M)
+        deltas = np.full(M, np.inf)
+        nearest_neighbors = np.arange(M)
+        # the nearest higher cell lies in the 3x3 neighborhood whenever one is there
+        for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
+            nx, ny = coords[:, 0] + dx, coords[:, 1] + dy
+            inside = (nx >= 0) & (nx < shape[0]) & (ny >= 0) & (ny < shape[1])
+            nb = np.full(M, -1, dtype=np.intp)
+            nb[inside] = cell_index[nx[inside], ny[inside]]
+            dist = h * np.hypot(dx, dy)
+            closer = (nb >= 0) & (rank[np.maximum(nb, 0)] < rank) & (dist < deltas)
+            deltas[closer] = dist
+            nearest_neighbors[closer] = nb[closer]
+        # local peaks search all higher cells, in blocks to bound memory
+        peaks = np.flatnonzero(np.isinf(deltas) & (rank > 0))
+        block = max(1, 2**20 // M)
+        for i in range(0, len(peaks), block):
+            p = peaks[i : i + block]
+            dists = h * np.hypot(
+                coords[p, 0, np.newaxis] - coords[:, 0],
+                coords[p, 1, np.newaxis] - coords[:, 1],
+            )
+            dists[rank[p, np.newaxis] <= rank] = np.inf
+            nearest_neighbors[p] = np.argmin(dists, axis=1)
+            deltas[p] = dists[np.arange(len(p)), nearest_neighbors[p]]
+        deltas[ordrho[0]] = np.max(deltas[np.isfinite(deltas)], initial=0)
+
+        # centers and labels of the cells
+        center_cells = np.argsort(-rhos * deltas)[: self.n_clusters]
+        nearest_neighbors[center_cells] = center_cells
+        roots = nearest_neighbors
+        while True:
+            next_roots = roots[roots]
+            if np.array_equal(next_roots, roots):
+                break
+            roots = next_roots
+        cell_labels = np.full(M, -1, dtype=np.intp)
+        cell_labels[center_cells] = np.arange(len(center_cells))
+        cell_labels = cell_labels[roots]
+
+        # pick the point closest to each center cell's center as the cluster center
+        centers = (coords[center_cells] + 0.5) * h + lo
+        self.index_centers_ = np.empty(len(center_cells), dtype=np.intp)
+        for i, cell in enumerate(center_cells):
+            members = np.flatnonzero(inverse == cell)
+            offset = np.hypot(*(points[members] - centers[i]).T)
+            self.index_centers_[i] = members[np.argmin(offset)]
+
+        self.rhos_ = rhos[inverse]
+        self.deltas_ = deltas[inverse]
+        self.labels_ = cell_labels[inverse]
+        self.cluster_centers_ = X[self.index_centers_]
+        if self.filter_halo:
+            self.labels_[self.deltas_ > self.dc] = -1
+            for i, center in enumerate(self.index_centers_):
+                self.labels_[center] = i
+        return self
+
+    def fit_many(self, frames, n_jobs=None):
+        """
+        Clusters every row of a stack of frames, giving the same results as `fit` per row.
+
+        In exact mode the distance matrices of as many frames as fit in `max_memory` are
+        computed into shared work buffers, and the cutoff, density and delta steps run
+        on the whole batch.
+
+        Parameters:
+        - frames (ndarray): The frames, shape (n_frames, N).
+        - n_jobs (int, optional): Number of worker processes the frames are split across.
+
+        Returns:
+        - self: With `labels_`, `rhos_` and `deltas_` of shape (n_frames, N),
+          `index_centers_` and `cluster_centers_` of shape (n_frames, n_clusters) and the
+          cutoff distance of every frame in `dcs_`.
+        """
+        frames = np.asarray(frames)
+        if n_jobs is not None and n_jobs > 1 and len(frames) > 1:
+            shards = np.array_split(frames, min(n_jobs, len(frames)))
+            with ProcessPoolExecutor(n_jobs) as pool:
+                results = list(
+                    pool.map(_fit_many_shard, [self.get_params()] * len(shards), shards)
+                )
+            for name in results[0]:
+                setattr(self, name, np.concatenate([r[name] for r in results]))
+            return self
+        if self.algorithm != "exact":
+            return self._fit_many_each(frames)
+
+        F, N = frames.shape
+        dtype = np.abs(frames[:0]).dtype
+        frame_bytes = N * N * 2 * dtype.itemsize
+        batch = int(max(1, min(F, self.max_memory // frame_bytes)))
+        dists = np.empty((batch, N, N), dtype=dtype)
+        work = np.empty((batch, N, N), dtype=dtype)
+        diff = np.empty((N, N), dtype=frames.dtype)
+        upper = np.triu(np.ones((N, N), dtype=bool))
+        position = int(N * (N - 1) * 0.02) + N
+
+        self.dcs_ = np.empty(F, dtype=dtype)
+        self.rhos_ = np.empty((F, N), dtype=dtype)
+        self.deltas_ = np.zeros((F, N))
+        nearest_neighbors = np.zeros((F, N), dtype=np.intp)
+        ordrho = np.empty((F, N), dtype=np.intp)
+        for start in range(0, F, batch):
+            X = frames[start : start + batch]
+            B = len(X)
+            D, W = dists[:B], work[:B]
+            for i in range(B):
+                np.subtract(X[i, :, np.newaxis], X[i], out=diff)
+                np.abs(diff, out=D[i])
+
+            # cutoff distance of every frame
+            if self.dc is None:
+                W[:] = D
+                flat = W.reshape(B, N * N)
+                flat.partition(position, axis=1)
+                dc = flat[:, position].copy()
+            else:
+                dc = np.full(B, self.dc, dtype=dtype)
+            self.dcs_[start : start + B] = dc
+
+            # local density using gaussian kernel
+            np.divide(D, dc[:, np.newaxis, np.newaxis], out=W)
+            np.square(W, out=W)
+            np.negative(W, out=W)
+            np.exp(W, out=W)
+            rhos = np.sum(W, axis=2) - 1
+            self.rhos_[start : start + B] = rhos
+
+            # delta and nearest neighbor: with rows and columns in density order, the
+            # points of higher density are the ones left of the diagonal
+            order = np.argsort(-rhos, axis=1)
+            ordrho[start : start + B] = order
+            for i in range(B):
+                np.take(D[i], order[i], axis=0, out=W[i])
+                np.take(W[i], order[i], axis=1, out=D[i])
+                np.putmask(D[i], upper, np.inf)
+            index_nn = np.argmin(D, axis=2)
+            deltas = np.take_along_axis(D, index_nn[:, :, np.newaxis], axis=2)[:, :, 0]
+            deltas[:, 0] = 0
+            rows = np.arange(start, start + B)[:, np.newaxis]
+            self.deltas_[rows, order] = deltas
+            nearest_neighbors[rows, order] = np.take_along_axis(order, index_nn, axis=1)
+            nearest_neighbors[rows[:, 0], order[:, 0]] = 0
+
+        top = ordrho[:, 0]
+        rows = np.arange(F)
+        self.deltas_[rows, top] = np.max(self.deltas_, axis=1)
+
+        self.index_centers_ = np.argsort(-self.rhos_ * self.deltas_, axis=1)[
+            :, : self.n_clusters
+        ]
+        self.cluster_centers_ = np.take_along_axis(frames, self.index_centers_, axis=1)
+
+        # every point takes the label of its nearest neighbor of higher density, so
+        # follow the neighbors up to a center. Like in `fit`, the densest point takes
+        # the label of point 0 at the time it is visited, which is only set for a center.
+        labels = np.full((F, N), -1, dtype=np.intp)
+        labels[rows[:, np.newaxis], self.index_centers_] = np.arange(self.n_clusters)
+        roots = nearest_neighbors
+        roots[rows[:, np.newaxis], self.index_centers_] = self.index_centers_
+        top_free = labels[rows, top] == -1
+        roots[rows[top_free], top[top_free]] = np.where(
+            labels[top_free, 0] >= 0, 0, top[top_free]
+        )
+        while True:
+            next_roots = np.take_along_axis(roots, roots, axis=1)
+            if np.array_equal(next_roots, roots):
+                break
+            roots = next_roots
+        self.labels_ = np.take_along_axis(labels, roots, axis=1)
+        if self.filter_halo:
+            self.labels_[self.deltas_ > self.dcs_[:, np.newaxis]] = -1
+            self.labels_[rows[:, np.newaxis], self.index_centers_] = np.arange(
+                self.n_clusters
+            )
+        return self
+
+    def _fit_many_each(self, frames):
+        fitted = []
+        for frame in frames:
+            dpc = DPC(**self.get_params()).fit(frame)
+            fitted.append(dpc)
+        for name in ["labels_", "rhos_", "deltas_", "index_centers_", "cluster_centers_"]:
+            setattr(self, name, np.stack([getattr(dpc, name) for dpc in fitted]))
+        self.dcs_ = np.array([dpc.dc for dpc in fitted])
+        return self
+
     def fit_predict(self, X):
         self.fit(X)
         return self.labels_
+
+
+def _fit_many_shard(params, frames):
+    dpc = DPC(**params).fit_many(frames)
+    names = ["labels_", "rhos_", "deltas_", "index_centers_", "cluster_centers_", "dcs_"]
+    return {name: getattr(dpc, name) for name in names}
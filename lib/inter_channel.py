@@ -0,0 +1,301 @@
+import mmap
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+from utils import frame_sync, iter_rn16_frames
+
+FrameClusters = namedtuple("FrameClusters", ["labels", "index_centers", "rhos", "deltas"])
+FrameEstimate = namedtuple(
+    "FrameEstimate", ["inter_channel", "frame", "dc_mean", "h_est", "centers", "clusters"]
+)
+
+
+def estimate_dc(dists):
+    n = np.shape(dists)[0]
+    tt = np.reshape(dists, n * n)
+    position = int(n * (n - 1) * 0.02)
+    dc = np.sort(tt)[position + n]
+    return dc
+
+
+def mag_phase(frame):
+    """
+    Returns the (magnitude, phase) of every sample, shape (N, 2).
+    """
+    return np.array([np.abs(frame), np.angle(frame)]).T
+
+
+def decision_graph(points, cov):
+    """
+    Computes the density peaks decision graph of (magnitude, phase) points.
+
+    The phase axis is scaled by the ratio of the magnitude and phase variances.
+
+    Parameters:
+    - points (numpy.ndarray): The (magnitude, phase) of every sample, shape (N, 2).
+    - cov (numpy.ndarray): The diagonal 2x2 covariance matrix.
+
+    Returns:
+    - rhos (numpy.ndarray): The local density of every point.
+    - deltas (numpy.ndarray): The distance of every point to the nearest point of higher density.
+    """
+    N = points.shape[0]
+    dists = np.abs(points[:, np.newaxis] - points)
+    scale = cov[0, 0] / cov[1, 1]
+    dists = np.sqrt(dists[:, :, 0] ** 2 + dists[:, :, 1] ** 2 * scale)
+
+    # cutoff distance
+    dc = estimate_dc(dists)
+
+    rhos = np.sum(np.exp(-((dists / dc) ** 2)), axis=1) - 1
+    deltas = np.zeros(N)
+
+    ordrho = np.argsort(-rhos)
+    for i, index in enumerate(ordrho):
+        if i == 0:
+            continue
+        index_higher_rho = ordrho[:i]
+        deltas[index] = np.min(dists[index, index_higher_rho])
+        deltas[ordrho[0]] = np.max(deltas)
+    return rhos, deltas
+
+
+def gaussian_labels(points, means, cov, threshold=150000):
+    """
+    Labels points with the most likely of several Gaussians sharing a diagonal covariance.
+
+    Parameters:
+    - points (numpy.ndarray): The (magnitude, phase) of every sample, shape (N, 2).
+    - means (numpy.ndarray): The (magnitude, phase) of every center, shape (k, 2).
+    - cov (numpy.ndarray): The diagonal 2x2 covariance matrix.
+    - threshold (float): Minimum pdf value for a sample to be labelled.
+
+    Returns:
+    - labels (numpy.ndarray): Index of the most likely center of every sample, or -1
+      where no pdf exceeds the threshold.
+    """
+    var = np.diag(cov)
+    # squared Mahalanobis distance of every sample to every center, shape (N, k)
+    maha = np.sum((points[:, np.newaxis] - means) ** 2 / var, axis=2)
+    log_pdf = -0.5 * (len(var) * np.log(2 * np.pi) + np.sum(np.log(var)) + maha)
+    best = np.argmax(log_pdf, axis=1)
+    return np.where(
+        log_pdf[np.arange(len(points)), best] > np.log(threshold), best, -1
+    )
+
+
+def cluster_frame(frame, cov):
+    """
+    Clusters the samples of an RN16 frame into the four backscatter states.
+
+    Parameters:
+    - frame (numpy.ndarray): The synchronized RN16 frame.
+    - cov (numpy.ndarray): The diagonal 2x2 covariance matrix of the noise.
+
+    Returns:
+    - FrameClusters: A namedtuple with fields:
+      - labels (numpy.ndarray): The state of every sample, or -1 for unlabelled samples.
+      - index_centers (numpy.ndarray): The indices of the samples picked as centers.
+      - rhos, deltas (numpy.ndarray): The decision graph of the samples.
+    """
+    points = mag_phase(frame)
+    rhos, deltas = decision_graph(points, cov)
+
+    idx1 = np.argsort(-rhos * deltas)
+    idx2 = idx1[np.argwhere(rhos[idx1] > 10).flatten()]
+    index_centers = idx2[:4]
+
+    labels = gaussian_labels(points, points[index_centers], cov)
+    return FrameClusters(labels, index_centers, rhos, deltas)
+
+
+def sort_centers(centers, dc_mean, h_est):
+    idx = np.arange(0, 4)
+    index_ll = np.argmin(np.abs(centers - dc_mean))
+    index_hh = np.argmin(np.abs(centers - h_est))
+    idx = np.delete(idx, [index_ll, index_hh])
+    idx = np.hstack(([index_ll], idx, [index_hh]))
+    return centers[idx]
+
+
+def calc_inter_channel(centers):
+    inter_channel = (
+        centers[1] - centers[0] + centers[2] - centers[0] - (centers[3] - centers[0])
+    )
+    return inter_channel
+
+
+def noise_cov(dc):
+    """
+    Returns the diagonal (magnitude, phase) covariance matrix of the DC samples.
+    """
+    mag_var = np.var(np.abs(dc))
+    phase_var = np.var(np.angle(dc))
+    return np.array([[mag_var, 0], [0, phase_var]])
+
+
+def estimate_frame(frame, dc):
+    """
+    Estimates the inter-channel of one RN16 frame, keeping the intermediate results.
+
+    Parameters:
+    - frame (numpy.ndarray): The RN16 frame.
+    - dc (numpy.ndarray): The samples preceding the frame.
+
+    Returns:
+    - FrameEstimate: A namedtuple with the inter-channel, the synchronized frame, the DC
+      mean, the channel response, the four state centers sorted by `sort_centers` and the
+      `FrameClusters` of the frame.
+    """
+    dc_mean = np.mean(dc)
+    cov = noise_cov(dc)
+
+    frame_start, h_est = frame_sync(frame - dc_mean)
+    h_est += dc_mean
+    frame = frame[frame_start:]
+
+    clusters = cluster_frame(frame, cov)
+    centers = np.zeros(4, dtype=np.complex64)
+    for i in range(4):
+        centers[i] = np.mean(frame[clusters.labels == i])
+
+    centers_sorted = sort_centers(centers, dc_mean, h_est)
+    inter_channel = calc_inter_channel(centers_sorted)
+    return FrameEstimate(inter_channel, frame, dc_mean, h_est, centers_sorted, clusters)
+
+
+def process_one_frame(frame, dc):
+    """
+    Estimates the inter-channel of one RN16 frame, see `estimate_frame`.
+
+    Parameters:
+    - frame (numpy.ndarray): The RN16 frame.
+    - dc (numpy.ndarray): The samples preceding the frame.
+
+    Returns:
+    - complex: The inter-channel.
+    """
+    return estimate_frame(frame, dc).inter_channel
+
+
+# the capture as seen by a worker process
+_worker_sig = None
+_worker_shm = None
+
+
+def _attach(source):
+    global _worker_sig, _worker_shm
+    if source[0] == "file":
+        _, path, offset = source
+        _worker_sig = np.memmap(path, dtype=np.complex64, mode="r", offset=offset)
+    else:
+        _, name, n_samples = source
+        _worker_shm = shared_memory.SharedMemory(name=name)
+        _worker_sig = np.ndarray(n_samples, dtype=np.complex64, buffer=_worker_shm.buf)
+
+
+def _process_frames(sig, starts, n_rn16, n_dc):
+    inter_channels = np.empty(len(starts), dtype=np.complex64)
+    for i, start in enumerate(starts):
+        inter_channels[i] = process_one_frame(
+            sig[start : start + n_rn16], sig[start - n_dc : start]
+        )
+    return inter_channels
+
+
+def _process_frames_worker(starts, n_rn16, n_dc):
+    return _process_frames(_worker_sig, starts, n_rn16, n_dc)
+
+
+def extract_inter_channels(
+    sig,
+    workers=None,
+    n_max_gap=440,
+    n_t1=470,
+    n_rn16=1250,
+    threshold=0.05,
+    n_dc=200,
+    chunk_frames=64,
+    callback=None,
+):
+    """
+    Estimates the inter-channel of every RN16 frame of a capture in a process pool.
+
+    Frames are located in one streaming pass, then batches of frame offsets are sent to
+    the workers. The workers read the samples from a memory map of the capture file, or
+    from a shared memory copy of an in-memory capture, so frames are never pickled.
+
+    Parameters:
+    - sig (str | os.PathLike | numpy.ndarray): A complex64 capture file or array.
+    - workers (int, optional): Number of worker processes. Defaults to the CPU count.
+    - n_max_gap (int): Maximum number of low-level continuous samples of the reader command signal.
+    - n_t1 (int): Number of samples before the start of each frame.
+    - n_rn16 (int): Number of RN16 samples in each frame.
+    - threshold (float): Amplitude below which the reader signal is considered low.
+    - n_dc (int): Number of samples before each frame used to estimate the DC component.
+    - chunk_frames (int): Number of frames per task.
+    - callback (callable, optional): Called as `callback(n_done, n_frames)` after each task.
+
+    Returns:
+    - inter_channels (numpy.ndarray): The inter-channel of every frame, in capture order.
+    - starts (numpy.ndarray): Absolute start index of each frame.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if isinstance(sig, (str, os.PathLike)):
+        sig = np.memmap(sig, dtype=np.complex64, mode="r")
+    elif not isinstance(sig, np.memmap):
+        sig = np.asarray(sig, dtype=np.complex64)
+    starts = np.array(
+        [
+            start
+            for start, _, _ in iter_rn16_frames(
+                sig, n_max_gap, n_t1, n_rn16, threshold=threshold, n_dc=n_dc
+            )
+        ],
+        dtype=np.int64,
+    )
+    inter_channels = np.empty(len(starts), dtype=np.complex64)
+    batches = [
+        (i, starts[i : i + chunk_frames]) for i in range(0, len(starts), chunk_frames)
+    ]
+
+    if workers <= 1:
+        for i, batch in batches:
+            inter_channels[i : i + len(batch)] = _process_frames(sig, batch, n_rn16, n_dc)
+            if callback is not None:
+                callback(i + len(batch), len(starts))
+        return inter_channels, starts
+
+    shm = None
+    if isinstance(sig, np.memmap) and isinstance(sig.base, mmap.mmap):
+        # a whole memory map, whose file can be mapped again by the workers
+        source = ("file", sig.filename, sig.offset)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sig.nbytes))
+        np.ndarray(len(sig), dtype=np.complex64, buffer=shm.buf)[:] = sig
+        source = ("shm", shm.name, len(sig))
+    try:
+        with ProcessPoolExecutor(
+            workers, initializer=_attach, initargs=(source,)
+        ) as pool:
+            futures = {
+                pool.submit(_process_frames_worker, batch, n_rn16, n_dc): i
+                for i, batch in batches
+            }
+            n_done = 0
+            for future in as_completed(futures):
+                result = future.result()
+                i = futures[future]
+                inter_channels[i : i + len(result)] = result
+                n_done += len(result)
+                if callback is not None:
+                    callback(n_done, len(starts))
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    return inter_channels, starts
@@ -0,0 +1,117 @@
+import numpy as np
+from rfid import PulseIntervalEncoder, RFIDReaderCommand
+
+COMMANDS = ("select", "query", "query_adjust", "query_rep")
+
+# dtype of the per-command offset table emitted by `InventoryScript.compile`
+OFFSET_DTYPE = np.dtype(
+    [("offset", np.int64), ("length", np.int64), ("command", "U12")]
+)
+
+
+class InventoryScript:
+    """
+    A declarative reader schedule of Gen2 commands and gaps.
+
+    Steps are added with the builder methods, which take the same parameters as the
+    corresponding `RFIDReaderCommand` methods. Gaps are given in microseconds.
+
+    Example:
+        script = InventoryScript().silence(50000).cw(50000).query(q=0).cw(1250)
+        for _ in range(99):
+            script.query_adjust().cw(1250)
+        sig, table = script.compile(2e6)
+    """
+
+    def __init__(self):
+        self.steps = []
+
+    def select(self, **params):
+        self.steps.append(("select", params))
+        return self
+
+    def query(self, **params):
+        self.steps.append(("query", params))
+        return self
+
+    def query_adjust(self, **params):
+        self.steps.append(("query_adjust", params))
+        return self
+
+    def query_rep(self, **params):
+        self.steps.append(("query_rep", params))
+        return self
+
+    def cw(self, duration):
+        """
+        Adds `duration` us of unmodulated carrier.
+        """
+        self.steps.append(("cw", duration))
+        return self
+
+    def silence(self, duration):
+        """
+        Adds `duration` us with the carrier off.
+        """
+        self.steps.append(("silence", duration))
+        return self
+
+    def segments(self, samp_rate, pw_d=12):
+        """
+        Yields `(step, segment)` pairs in order.
+
+        Command segments are complex64 waveforms. Gaps are `(level, n_samples)` tuples so
+        that long constant runs are never materialized.
+        """
+        reader = RFIDReaderCommand(PulseIntervalEncoder(samp_rate, pw_d, as_array=True))
+        for step, params in self.steps:
+            if step in COMMANDS:
+                yield step, getattr(reader, step)(**params)
+            else:
+                level = 1 if step == "cw" else 0
+                yield step, (level, int(round(params * 1e-6 * samp_rate)))
+
+    def compile(self, samp_rate, pw_d=12):
+        """
+        Compiles the script into one preallocated waveform.
+
+        Args:
+            samp_rate (float): The sample rate in Hz.
+            pw_d (int, optional): The pulse width duration in us. Defaults to 12us.
+
+        Returns:
+            sig (np.ndarray): The complex64 waveform of the whole script.
+            table (np.ndarray): The sample offset, length and type of every command,
+                with dtype `OFFSET_DTYPE`.
+        """
+        segments = list(self.segments(samp_rate, pw_d))
+        lengths = [
+            seg[1] if isinstance(seg, tuple) else len(seg) for _, seg in segments
+        ]
+        sig = np.empty(sum(lengths), dtype=np.complex64)
+        table = []
+        offset = 0
+        for (step, seg), length in zip(segments, lengths):
+            if isinstance(seg, tuple):
+                sig[offset : offset + length] = seg[0]
+            else:
+                sig[offset : offset + length] = seg
+                table.append((offset, length, step))
+            offset += length
+        return sig, np.array(table, dtype=OFFSET_DTYPE)
+
+
+def reply_offsets(table, n_t1, commands=("query", "query_adjust", "query_rep")):
+    """
+    Returns the sample offsets at which tag replies to `commands` are expected.
+
+    Args:
+        table (np.ndarray): The command offset table of a compiled script.
+        n_t1 (int): Number of samples between the end of a command and the reply.
+        commands (tuple, optional): The commands that solicit a reply.
+
+    Returns:
+        np.ndarray: The expected reply start offsets.
+    """
+    table = table[np.isin(table["command"], commands)]
+    return table["offset"] + table["length"] + n_t1
@@ -0,0 +1,189 @@
+import numpy as np
+
+
+class P2Quantiles:
+    """
+    Streaming quantile estimates with the P² algorithm (Jain & Chlamtac, 1985), for
+    several independent streams at once, e.g. one per tag pair.
+
+    Each quantile of each stream is tracked by five markers whose heights are adjusted
+    with a piecewise-parabolic prediction as values arrive, so memory and update cost do
+    not depend on the number of values. Until a stream has five values its quantiles are
+    exact.
+
+    Args:
+        q (sequence of float, optional): The quantiles to track, in [0, 1]. Defaults to the quartiles.
+        shape (tuple, optional): Shape of the streams, one value per stream is passed to
+            `update`. Defaults to a single stream.
+
+    Example:
+        sketch = P2Quantiles(shape=(n_pairs,))
+        for inter_est in frames:  # shape (n_pairs,)
+            sketch.update(np.abs(inter_est))
+        q1, q3 = np.moveaxis(sketch.quantiles(), -1, 0)
+    """
+
+    def __init__(self, q=(0.25, 0.75), shape=()):
+        self.q = np.asarray(q, dtype=np.float64)
+        self.shape = tuple(shape)
+        if self.q.ndim != 1 or np.any((self.q < 0) | (self.q > 1)):
+            raise ValueError(
+                "Invalid q value. Must be a sequence of quantiles in [0, 1]."
+            )
+        # increments of the desired marker positions
+        zeros = np.zeros_like(self.q)
+        self._dn = np.stack(
+            [zeros, self.q / 2, self.q, (1 + self.q) / 2, zeros + 1], axis=-1
+        )
+        self.reset()
+
+    def reset(self):
+        # streams are flattened, state arrays are (n_streams, len(q), 5)
+        n_streams = int(np.prod(self.shape, dtype=np.int64))
+        state = (n_streams, len(self.q), 5)
+        self._count = np.zeros(n_streams, dtype=np.int64)
+        self._heights = np.zeros(state)
+        self._positions = np.broadcast_to(np.arange(1.0, 6.0), state).copy()
+        self._desired = np.broadcast_to(1 + 4 * self._dn, state).copy()
+
+    @property
+    def count(self):
+        """Number of values of each stream."""
+        return self._count.reshape(self.shape)
+
+    def update(self, x, where=True):
+        """
+        Adds one value to each stream.
+
+        Args:
+            x (array-like): The values, broadcastable to `shape`.
+            where (array-like of bool, optional): The streams receiving a value. Defaults to all.
+        """
+        x = np.broadcast_to(np.asarray(x, dtype=np.float64), self.shape).reshape(-1)
+        where = np.broadcast_to(where, self.shape).reshape(-1)
+
+        # the first five values of a stream are stored as they are, then sorted
+        warm = np.flatnonzero(where & (self._count < 5))
+        if len(warm):
+            self._heights[warm, :, self._count[warm]] = x[warm, np.newaxis]
+            full = warm[self._count[warm] == 4]
+            self._heights[full] = np.sort(self._heights[full], axis=-1)
+
+        streams = np.flatnonzero(where & (self._count >= 5))
+        self._count += where
+        if not len(streams):
+            return
+        xq = x[streams, np.newaxis]
+        h = self._heights[streams]
+        n = self._positions[streams]
+        # cell of x between the markers, the extreme markers follow the min and max
+        k = np.sum(h[..., 1:4] <= xq[..., np.newaxis], axis=-1)
+        h[..., 0] = np.minimum(h[..., 0], xq)
+        h[..., 4] = np.maximum(h[..., 4], xq)
+        n += np.arange(5) > k[..., np.newaxis]
+        desired = self._desired[streams] + self._dn
+
+        for i in range(1, 4):
+            d = desired[..., i] - n[..., i]
+            move = ((d >= 1) & (n[..., i + 1] - n[..., i] > 1)) | (
+                (d <= -1) & (n[..., i - 1] - n[..., i] < -1)
+            )
+            if not np.any(move):
+                continue
+            d = np.sign(d) * move
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parabolic = h[..., i] + d / (n[..., i + 1] - n[..., i - 1]) * (
+                    (n[..., i] - n[..., i - 1] + d)
+                    * (h[..., i + 1] - h[..., i])
+                    / (n[..., i + 1] - n[..., i])
+                    + (n[..., i + 1] - n[..., i] - d)
+                    * (h[..., i] - h[..., i - 1])
+                    / (n[..., i] - n[..., i - 1])
+                )
+                j = np.where(d > 0, i + 1, i - 1)[..., np.newaxis]
+                linear = h[..., i] + d * (
+                    np.take_along_axis(h, j, -1)[..., 0] - h[..., i]
+                ) / (np.take_along_axis(n, j, -1)[..., 0] - n[..., i])
+            inside = (h[..., i - 1] < parabolic) & (parabolic < h[..., i + 1])
+            h[..., i] = np.where(move, np.where(inside, parabolic, linear), h[..., i])
+            n[..., i] += d
+
+        self._heights[streams] = h
+        self._positions[streams] = n
+        self._desired[streams] = desired
+
+    def extend(self, data, axis=0):
+        """Adds the values of `data` to the streams one by one along `axis`."""
+        for x in np.moveaxis(np.asarray(data), axis, 0):
+            self.update(x)
+
+    def quantiles(self):
+        """
+        Returns the current estimates, shape `shape + (len(q),)`, exact for streams with
+        fewer than five values and NaN for streams without values.
+        """
+        estimates = self._heights[..., 2].copy()
+        warm = np.flatnonzero(self._count < 5)
+        if len(warm):
+            count = self._count[warm, np.newaxis]
+            heights = np.where(np.arange(5) < count, self._heights[warm, 0], np.inf)
+            heights = np.sort(heights, axis=-1)
+            virtual = self.q * (count - 1)
+            lo = np.clip(np.floor(virtual).astype(np.intp), 0, 4)
+            hi = np.clip(np.minimum(lo + 1, count - 1), 0, 4)
+            a = np.take_along_axis(heights, lo, -1)
+            b = np.take_along_axis(heights, hi, -1)
+            with np.errstate(invalid="ignore"):
+                exact = np.where(hi > lo, a + (b - a) * (virtual - lo), a)
+            estimates[warm] = np.where(count > 0, exact, np.nan)
+        return estimates.reshape(self.shape + (len(self.q),))
+
+
+class StreamingOutlierFilter:
+    """
+    Flags outliers as values arrive, the values not strictly within `m` iqrs of the
+    quartiles of the values seen so far, estimated with `P2Quantiles`. This is the
+    streaming counterpart of `utils.outlier_mask`.
+
+    Args:
+        m (float, optional): The number of iqrs to consider as the threshold for outliers. Defaults to 2.
+        shape (tuple, optional): Shape of the streams, e.g. `(n_pairs,)`. Defaults to a single stream.
+        min_count (int, optional): Number of values a stream needs before values are
+            flagged. Defaults to 5.
+    """
+
+    def __init__(self, m=2, shape=(), min_count=5):
+        self.m = m
+        self.min_count = min_count
+        self.sketch = P2Quantiles((0.25, 0.75), shape)
+
+    def reset(self):
+        self.sketch.reset()
+
+    def is_outlier(self, x):
+        """Flags values against the current quartiles, without adding them."""
+        q1, q3 = np.moveaxis(self.sketch.quantiles(), -1, 0)
+        iqr_ = q3 - q1
+        x = np.asarray(x)
+        inside = (x > q1 - self.m * iqr_) & (x < q3 + self.m * iqr_)
+        return ~inside & (self.sketch.count >= self.min_count)
+
+    def update(self, x, where=True):
+        """
+        Flags values against the quartiles of the previous ones, then adds them.
+
+        Args:
+            x (array-like): One value per stream.
+            where (array-like of bool, optional): The streams receiving a value. Defaults to all.
+
+        Returns:
+            numpy.ndarray: A boolean mask of the outliers, `shape` of the streams.
+        """
+        mask = self.is_outlier(x) & where
+        self.sketch.update(x, where)
+        return mask
+
+    def filter(self, data, axis=0):
+        """Runs `update` over `data` along `axis`, returns the mask of the outliers."""
+        data = np.moveaxis(np.asarray(data), axis, 0)
+        return np.moveaxis(np.stack([self.update(x) for x in data]), 0, axis)
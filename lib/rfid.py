@@ -1,35 +1,165 @@
+import functools
+import inspect
 import re
+from collections import OrderedDict, namedtuple
 
-from epc_crc import crc5, crc16
+import numpy as np
+from crc import crc5_packed, crc16_packed
 
 # A preamble shall comprise a fixed-length start delimiter 12.5us +/-5%
 DELIM_DURATION = 12
 
 
-def ebv_encode(bits: list[int]) -> list[int]:
-    n_pad = (len(bits) + 6) // 7 * 7 - len(bits)
-    bits = [0] * n_pad + bits
-    n_block = len(bits) // 7
-    encoded = []
+class BitVector:
+    """
+    A growable MSB-first bit vector packed into a Python int.
+
+    Iterating, indexing and comparing a BitVector behave like the equivalent `list[int]`,
+    so it can be passed wherever a list of bits is expected.
+    """
+
+    __slots__ = ("value", "length")
+
+    def __init__(self, value: int = 0, length: int = 0):
+        if value < 0 or value >> length:
+            raise ValueError(f"Value {value} does not fit in {length} bits.")
+        self.value = value
+        self.length = length
+
+    @classmethod
+    def from_bits(cls, bits) -> "BitVector":
+        """
+        Packs a sequence of 0/1 bits into a BitVector.
+        """
+        if isinstance(bits, BitVector):
+            return cls(bits.value, bits.length)
+        bits = np.asarray(bits, dtype=bool).reshape(-1)
+        n = len(bits)
+        if n == 0:
+            return cls()
+        value = int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-n % 8)
+        return cls(value, n)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, n_bits: int) -> "BitVector":
+        """
+        Takes the first `n_bits` bits of `data`, MSB first.
+        """
+        n_byte = (n_bits + 7) // 8
+        value = int.from_bytes(bytes(data[:n_byte]), "big") >> (n_byte * 8 - n_bits)
+        return cls(value, n_bits)
+
+    @classmethod
+    def from_hex(cls, data: str) -> "BitVector":
+        """
+        Converts a hexadecimal string to a BitVector, ignoring any whitespace.
+        """
+        data = re.sub(r"\s+", "", data)
+        return cls(int(data, 16) if data else 0, 4 * len(data))
+
+    def append(self, value: int, length: int):
+        """
+        Appends the `length` low bits of `value`.
+        """
+        if value < 0 or value >> length:
+            raise ValueError(f"Value {value} does not fit in {length} bits.")
+        self.value = self.value << length | value
+        self.length += length
+
+    def extend(self, bits):
+        bits = bits if isinstance(bits, BitVector) else BitVector.from_bits(bits)
+        self.append(bits.value, bits.length)
+
+    def tobytes(self) -> bytes:
+        """
+        Returns the bits packed MSB first, zero-padded to a whole number of bytes.
+        """
+        n_byte = (self.length + 7) // 8
+        return (self.value << (n_byte * 8 - self.length)).to_bytes(n_byte, "big")
+
+    def tolist(self) -> list[int]:
+        if self.length == 0:
+            return []
+        return list(map(int, format(self.value, f"0{self.length}b")))
+
+    def crc5(self) -> "BitVector":
+        return BitVector(crc5_packed(self.tobytes(), self.length), 5)
+
+    def crc16(self) -> "BitVector":
+        return BitVector(crc16_packed(self.tobytes(), self.length), 16)
+
+    def __array__(self, dtype=None, copy=None):
+        bits = np.unpackbits(np.frombuffer(self.tobytes(), dtype=np.uint8))
+        bits = bits[: self.length]
+        return bits if dtype is None else bits.astype(dtype)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return BitVector.from_bits(self.tolist()[index])
+            stop = max(start, stop)
+            value = self.value >> (self.length - stop) & ((1 << (stop - start)) - 1)
+            return BitVector(value, stop - start)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("BitVector index out of range")
+        return self.value >> (self.length - 1 - index) & 1
+
+    def __add__(self, other):
+        bits = BitVector(self.value, self.length)
+        bits.extend(other)
+        return bits
+
+    def __eq__(self, other):
+        if isinstance(other, BitVector):
+            return self.value == other.value and self.length == other.length
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"BitVector('{format(self.value, f'0{self.length}b') if self.length else ''}')"
+
+
+def _ebv_encode(bits: BitVector) -> BitVector:
+    n_block = (len(bits) + 6) // 7
+    encoded = BitVector()
     for n in range(n_block):
         extension_bit = 1 if n < n_block - 1 else 0
-        block = [extension_bit] + bits[n * 7 : (n + 1) * 7]
-        encoded.extend(block)
+        block = bits.value >> (7 * (n_block - 1 - n)) & 0x7F
+        encoded.append(extension_bit << 7 | block, 8)
     return encoded
 
 
+def ebv_encode(bits: list[int]) -> list[int]:
+    return _ebv_encode(BitVector.from_bits(bits)).tolist()
+
+
 class PulseIntervalEncoder:
 
-    def __init__(self, samp_rate, pw_d=12):
+    def __init__(self, samp_rate, pw_d=12, as_array=False):
         """
         Initializes an instance of the PulseIntervalEncoder class.
 
         Args:
             samp_rate (int): The sample rate in Hz.
             pw_d (int, optional): The pulse width duration in us. Defaults to 12us.
+            as_array (bool, optional): Return complex64 ndarrays instead of lists from
+                `preamble`, `frame_sync` and `encode`. Defaults to False.
         """
         self.samp_rate = samp_rate
         self.pw_d = pw_d
+        self.as_array = as_array
         self.n_data0 = int(2 * pw_d * 1e-6 * samp_rate)
         self.n_data1 = int(4 * pw_d * 1e-6 * samp_rate)
         self.n_pw = int(pw_d * 1e-6 * samp_rate)
@@ -41,7 +171,36 @@ class PulseIntervalEncoder:
         self.data1 = [1] * self.n_data1
         self.data1[-self.n_pw :] = [0] * self.n_pw
 
+        # symbol templates for the array mode
+        self._data0 = self._symbol(self.n_data0)
+        self._data1 = self._symbol(self.n_data1)
+        self._frame_sync = np.concatenate(
+            (
+                np.zeros(self.n_delim, dtype=np.complex64),
+                self._data0,
+                self._symbol(self.n_rtcal),
+            )
+        )
+        self._preambles = {}
+
+    def _symbol(self, n):
+        sym = np.ones(n, dtype=np.complex64)
+        sym[n - self.n_pw :] = 0
+        return sym
+
+    def _preamble(self, blf, dr):
+        key = (blf, dr)
+        if key not in self._preambles:
+            # BLF = DR / TRcal => TRcal = DR / BLF
+            n_trcal = int(dr / blf * self.samp_rate)
+            self._preambles[key] = np.concatenate(
+                (self._frame_sync, self._symbol(n_trcal))
+            )
+        return self._preambles[key]
+
     def preamble(self, blf=40e3, dr=8):
+        if self.as_array:
+            return self._preamble(blf, dr).copy()
         # BLF = DR / TRcal => TRcal = DR / BLF
         n_trcal = int(dr / blf * self.samp_rate)
         delim = [0] * self.n_delim
@@ -52,12 +211,19 @@ class PulseIntervalEncoder:
         return delim + self.data0 + rt_cal + tr_cal
 
     def frame_sync(self):
+        if self.as_array:
+            return self._frame_sync.copy()
         delim = [0] * self.n_delim
         rt_cal = [1] * self.n_rtcal
         rt_cal[-self.n_pw :] = [0] * self.n_pw
         return delim + self.data0 + rt_cal
 
     def encode(self, data: list):
+        if self.as_array:
+            bits = np.asarray(data, dtype=bool)
+            out = np.empty(self._encoded_len(bits), dtype=np.complex64)
+            self._encode_into(bits, out)
+            return out
         sig = []
         for bit in data:
             if bit == 0:
@@ -66,73 +232,198 @@ class PulseIntervalEncoder:
                 sig += self.data1
         return sig
 
+    def _encoded_len(self, bits):
+        n_ones = int(np.count_nonzero(bits))
+        return n_ones * self.n_data1 + (len(bits) - n_ones) * self.n_data0
+
+    def _encode_into(self, bits, out):
+        # every symbol is high and ends with a low pulse of n_pw samples
+        out[:] = 1
+        ends = np.cumsum(np.where(bits, self.n_data1, self.n_data0))
+        low = ends[:, np.newaxis] - self.n_pw + np.arange(self.n_pw)
+        out[low.reshape(-1)] = 0
+
+    def command(self, data: list, dr=None, blf=40e3) -> np.ndarray:
+        """
+        Encodes a complete reader command into one preallocated complex64 buffer.
+
+        Args:
+            data (list): The command bits.
+            dr (float, optional): The TRcal divide ratio. If given the command starts with
+                a preamble, otherwise with a frame-sync.
+            blf (float, optional): The backscatter link frequency in Hz. Defaults to 40kHz.
+
+        Returns:
+            np.ndarray: The encoded command waveform.
+        """
+        head = self._frame_sync if dr is None else self._preamble(blf, dr)
+        bits = np.asarray(data, dtype=bool)
+        out = np.empty(len(head) + self._encoded_len(bits), dtype=np.complex64)
+        out[: len(head)] = head
+        self._encode_into(bits, out[len(head) :])
+        return out
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+
+class WaveformCache:
+
+    def __init__(self, maxsize=256):
+        """
+        Initializes a bounded LRU cache of read-only command waveforms.
+
+        Args:
+            maxsize (int, optional): The maximum number of cached waveforms. Defaults to 256.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._waveforms = OrderedDict()
+
+    def get(self, key, make):
+        """
+        Returns the waveform cached under `key`, calling `make()` to build it on a miss.
+        """
+        try:
+            sig = self._waveforms[key]
+        except KeyError:
+            self.misses += 1
+            sig = np.asarray(make())
+            sig.flags.writeable = False
+            self._waveforms[key] = sig
+            if len(self._waveforms) > self.maxsize:
+                self._waveforms.popitem(last=False)
+                self.evictions += 1
+            return sig
+        self.hits += 1
+        self._waveforms.move_to_end(key)
+        return sig
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self._waveforms)
+        )
+
+    def clear(self):
+        self._waveforms.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# shared by all readers, so rebuilding a reader for the same sample rate still hits
+waveform_cache = WaveformCache()
+
+
+def _freeze(value):
+    if isinstance(value, (BitVector, list, tuple, np.ndarray)):
+        bits = BitVector.from_bits(value)
+        return bits.value, bits.length
+    return value
+
+
+def _cached(command):
+    signature = inspect.signature(command)
+
+    @functools.wraps(command)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None or not self.pie.as_array:
+            return command(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        params = tuple(_freeze(v) for v in list(bound.arguments.values())[1:])
+        key = (command.__name__, params, self.pie.samp_rate, self.pie.pw_d)
+        return self.cache.get(key, lambda: command(self, *args, **kwargs))
+
+    return wrapper
+
 
 class RFIDReaderCommand:
 
-    def __init__(self, pie: PulseIntervalEncoder):
+    def __init__(self, pie: PulseIntervalEncoder, cache=waveform_cache):
+        """
+        Initializes an instance of the RFIDReaderCommand class.
+
+        Args:
+            pie (PulseIntervalEncoder): The encoder used to build the command waveforms.
+            cache (WaveformCache, optional): The cache of command waveforms, only used when
+                `pie` is in array mode. Cached waveforms are read-only. Pass None to disable
+                caching. Defaults to the shared `waveform_cache`.
+        """
         self.pie = pie
+        self.cache = cache
+
+    def _frame(self, bits: "BitVector", dr=None):
+        if self.pie.as_array:
+            return self.pie.command(bits, dr=dr)
+        if dr is None:
+            return self.pie.frame_sync() + self.pie.encode(bits)
+        return self.pie.preamble(dr=dr) + self.pie.encode(bits)
 
+    @_cached
     def select(
         self,
         pointer: int,
         length: int,
-        mask: list[int],
+        mask: "list[int] | BitVector",
         trunc: bool = False,
         target: str = "sl",
         action: int = 0,
         mem_bank: str = "FileType",
     ):
-        bits = [1, 0, 1, 0]
+        bits = BitVector(0b1010, 4)
         if target not in ["inv-s0", "inv-s1", "inv-s2", "inv-s3", "sl"]:
             raise ValueError(
                 "Invalid target value. Must be either 'inv-s0', 'inv-s1', 'inv-s2', 'inv-s3', or 'sl'."
             )
         if target == "inv-s0":
-            bits += [0, 0, 0]
+            bits.append(0b000, 3)
         elif target == "inv-s1":
-            bits += [0, 0, 1]
+            bits.append(0b001, 3)
         elif target == "inv-s2":
-            bits += [0, 1, 0]
+            bits.append(0b010, 3)
         elif target == "inv-s3":
-            bits += [0, 1, 1]
+            bits.append(0b011, 3)
         else:
-            bits += [1, 0, 0]
+            bits.append(0b100, 3)
 
         if action < 0 or action > 7:
             raise ValueError("Invalid action value. Must be between 0 and 7.")
 
-        bits += list(map(int, format(action, "03b")))
+        bits.append(action, 3)
 
         if mem_bank not in ["FileType", "EPC", "TID", "File_0"]:
             raise ValueError(
                 "Invalid mem_bank value. Must be either 'FileType', 'EPC', 'TID', or 'File_0'."
             )
         if mem_bank == "FileType":
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif mem_bank == "EPC":
-            bits += [0, 1]
+            bits.append(0b01, 2)
         elif mem_bank == "TID":
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
-        bits += ebv_encode(list(map(int, bin(pointer)[2:])))
+        bits.extend(_ebv_encode(BitVector(pointer, max(1, pointer.bit_length()))))
         if length < 0 or length > 255:
             raise ValueError("Invalid length value. Must be between 0 and 255.")
-        bits += list(map(int, format(length, "08b")))
+        bits.append(length, 8)
+        mask = BitVector.from_bits(mask)
         if len(mask) != length:
             raise ValueError("Mask length must match the specified length.")
-        bits += mask
+        bits.extend(mask)
 
         if trunc:
-            bits += [1]
+            bits.append(0b1, 1)
         else:
-            bits += [0]
+            bits.append(0b0, 1)
 
-        bits += crc16(bits)
+        bits.extend(bits.crc16())
 
-        return self.pie.frame_sync() + self.pie.encode(bits)
+        return self._frame(bits)
 
+    @_cached
     def query(
         self,
         dr: str = "8",
@@ -159,67 +450,68 @@ class RFIDReaderCommand:
             sig: The encoded query command waveform.
         """
 
-        bits = [1, 0, 0, 0]
+        bits = BitVector(0b1000, 4)
         if dr not in ["8", "64/3"]:
             raise ValueError("Invalid dr value. Must be either '8' or '64/3'.")
         if dr == "8":
-            bits += [0]
+            bits.append(0b0, 1)
         else:
-            bits += [1]
+            bits.append(0b1, 1)
         if m not in [1, 2, 4, 8]:
             raise ValueError("Invalid m value. Must be either 1, 2, 4, or 8.")
         if m == 1:
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif m == 2:
-            bits += [0, 1]
+            bits.append(0b01, 2)
         elif m == 4:
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
         if trext:
-            bits += [1]
+            bits.append(0b1, 1)
         else:
-            bits += [0]
+            bits.append(0b0, 1)
 
         if sel not in ["all", "sl", "~sl"]:
             raise ValueError("Invalid sel value. Must be either 'all', '~sl', or 'sl'.")
         if sel == "all":
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif sel == "~sl":
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
         if session not in ["s0", "s1", "s2", "s3"]:
             raise ValueError(
                 "Invalid session value. Must be either 's0', 's1', 's2', or 's3'."
             )
         if session == "s0":
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif session == "s1":
-            bits += [0, 1]
+            bits.append(0b01, 2)
         elif session == "s2":
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
         if target not in ["A", "B"]:
             raise ValueError("Invalid target value. Must be either 'A' or 'B'.")
         if target == "A":
-            bits += [0]
+            bits.append(0b0, 1)
         else:
-            bits += [1]
+            bits.append(0b1, 1)
 
         if q < 0 or q > 15:
             raise ValueError("Invalid q value. Must be between 0 and 15.")
-        bits += list(map(int, format(q, "04b")))
+        bits.append(q, 4)
 
-        bits += crc5(bits)
+        bits.extend(bits.crc5())
 
         dr = 8 if dr == "8" else 64 / 3
-        return self.pie.preamble(dr=dr) + self.pie.encode(bits)
+        return self._frame(bits, dr=dr)
 
+    @_cached
     def query_rep(self, session: str = "s0"):
         """
         QueryRep instructs Tags to decrement their slot counters.
@@ -230,23 +522,24 @@ class RFIDReaderCommand:
         Returns:
             sig: The encoded query command waveform.
         """
-        bits = [0, 0]
+        bits = BitVector(0b00, 2)
         if session not in ["s0", "s1", "s2", "s3"]:
             raise ValueError(
                 "Invalid session value. Must be either 's0', 's1', 's2', or 's3'."
             )
 
         if session == "s0":
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif session == "s1":
-            bits += [0, 1]
+            bits.append(0b01, 2)
         elif session == "s2":
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
-        return self.pie.frame_sync() + self.pie.encode(bits)
+        return self._frame(bits)
 
+    @_cached
     def query_adjust(self, session: str = "s0", updn: str = "="):
         """
         QueryAdjust instructs Tags to adjust their slot counters.
@@ -258,32 +551,32 @@ class RFIDReaderCommand:
         Returns:
             sig: The encoded query command waveform.
         """
-        bits = [1, 0, 0, 1]
+        bits = BitVector(0b1001, 4)
         if session not in ["s0", "s1", "s2", "s3"]:
             raise ValueError(
                 "Invalid session value. Must be either 's0', 's1', 's2', or 's3'."
             )
 
         if session == "s0":
-            bits += [0, 0]
+            bits.append(0b00, 2)
         elif session == "s1":
-            bits += [0, 1]
+            bits.append(0b01, 2)
         elif session == "s2":
-            bits += [1, 0]
+            bits.append(0b10, 2)
         else:
-            bits += [1, 1]
+            bits.append(0b11, 2)
 
         if updn not in ["=", "+", "-"]:
             raise ValueError("Invalid updn value. Must be either '=', '+' or '-'.")
 
         if updn == "=":
-            bits += [0, 0, 0]
+            bits.append(0b000, 3)
         elif updn == "+":
-            bits += [1, 1, 0]
+            bits.append(0b110, 3)
         else:
-            bits += [0, 1, 1]
+            bits.append(0b011, 3)
 
-        return self.pie.frame_sync() + self.pie.encode(bits)
+        return self._frame(bits)
 
 
 def epc_str_to_bits(epc: str) -> list[int]:
@@ -297,6 +590,4 @@ def epc_str_to_bits(epc: str) -> list[int]:
     Returns:
         list[int]: A list of bits representing the EPC.
     """
-    epc = epc.strip()
-    epc = re.sub(r"\s+", "", epc)
-    return list(map(int, "".join(format(int(c, 16), "04b") for c in epc)))
+    return BitVector.from_hex(epc).tolist()
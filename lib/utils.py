@@ -1,37 +1,181 @@
+import functools
+import os
+
 import numpy as np
-from scipy import signal
-from scipy.stats import iqr
+from scipy import fft, signal
+
+
+def rn16_frame_windows(sig, n_max_gap, n_t1, n_rn16, n_dc=200):
+    """
+    Locates RN16 frames in a given signal without copying them, see `extract_rn16_frames`.
+
+    Parameters:
+    - sig (numpy.ndarray): Input signal.
+    - n_max_gap (int): Maximum number of low-level continuous samples of the reader command signal.
+    - n_t1 (int): Number of samples before the start of each frame.
+    - n_rn16 (int): Number of RN16 samples in each frame.
+    - n_dc (int): Number of samples before each frame used to estimate the DC component.
 
+    Returns:
+    - windows (numpy.ndarray): Every run of n_dc + n_rn16 samples of `sig`, a read-only
+      view of shape (len(sig) - n_dc - n_rn16 + 1, n_dc + n_rn16).
+    - rows (numpy.ndarray): The row of each frame in `windows`, so that
+      `windows[rows, n_dc:]` are the frames and `windows[rows, :n_dc]` their DC samples.
+    """
+    sig = np.asarray(sig)
+    idx = np.flatnonzero(np.abs(sig) < 0.005)
+    idx = idx[:-1][np.diff(idx) > n_max_gap]
+    bs_start = idx + n_t1
+    bs_start = bs_start[(bs_start >= n_dc) & (bs_start + n_rn16 < len(sig))]
+    if len(sig) < n_dc + n_rn16:
+        windows = np.empty((0, n_dc + n_rn16), dtype=sig.dtype)
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(sig, n_dc + n_rn16)
+    return windows, bs_start - n_dc
 
-def extract_rn16_frames(sig, n_max_gap, n_t1, n_rn16):
+
+def extract_rn16_frames(sig, n_max_gap, n_t1, n_rn16, n_dc=200):
     """
     Extracts RN16 frames from a given signal.
 
+    Frames whose DC history would start before the signal, or that run up to its end,
+    are skipped.
+
     Parameters:
     - sig (numpy.ndarray): Input signal.
     - n_max_gap (int): Maximum number of low-level continuous samples of the reader command signal.
     - n_t1 (int): Number of samples before the start of each frame.
     - n_rn16 (int): Number of RN16 samples in each frame.
+    - n_dc (int): Number of samples before each frame used to estimate the DC component.
+
+    Returns:
+    - frames (numpy.ndarray): Extracted RN16 frames, shape (n_frames, n_rn16).
+    - frames_dc (numpy.ndarray): Estimated DC component of each frame, shape (n_frames, n_dc).
+    """
+    windows, rows = rn16_frame_windows(sig, n_max_gap, n_t1, n_rn16, n_dc)
+    block = windows[rows]
+    return block[:, n_dc:], block[:, :n_dc]
+
+
+class _FrameWindow:
+    """
+    The samples of one RN16 frame and its DC history, filled as chunks stream by.
+    """
+
+    def __init__(self, start, n_dc, n_rn16):
+        self.start = start
+        self.begin = start - n_dc
+        self.samples = np.empty(n_dc + n_rn16, dtype=np.complex64)
+        self.n_filled = 0
+
+    def fill(self, chunk, base):
+        lo = max(self.begin + self.n_filled, base)
+        hi = min(self.begin + len(self.samples), base + len(chunk))
+        if lo < hi and lo == self.begin + self.n_filled:
+            self.samples[self.n_filled : self.n_filled + hi - lo] = chunk[
+                lo - base : hi - base
+            ]
+            self.n_filled += hi - lo
+
+    def complete(self):
+        return self.n_filled == len(self.samples)
+
+
+def _iter_chunks(sig, chunk_size):
+    if isinstance(sig, (str, os.PathLike)):
+        sig = np.memmap(sig, dtype=np.complex64, mode="r")
+    if isinstance(sig, np.ndarray):
+        for i in range(0, len(sig), chunk_size):
+            yield sig[i : i + chunk_size]
+    else:
+        yield from sig
+
+
+def iter_rn16_frames(
+    sig, n_max_gap, n_t1, n_rn16, threshold=0.005, n_dc=200, chunk_size=1 << 20
+):
+    """
+    Extracts RN16 frames from a capture in bounded chunks, see `extract_rn16_frames`.
+
+    Only `chunk_size` samples and the frames under construction are held in memory, so
+    multi-gigabyte captures can be processed through a memory map. Frames whose DC
+    history would start before the capture are skipped.
+
+    Parameters:
+    - sig (str | os.PathLike | numpy.ndarray | iterable): A complex64 capture file, which is
+      memory-mapped, an array (e.g. an `np.memmap`) or an iterable of complex64 chunks.
+    - n_max_gap (int): Maximum number of low-level continuous samples of the reader command signal.
+    - n_t1 (int): Number of samples before the start of each frame.
+    - n_rn16 (int): Number of RN16 samples in each frame.
+    - threshold (float): Amplitude below which the reader signal is considered low.
+    - n_dc (int): Number of samples before each frame used to estimate the DC component.
+    - chunk_size (int): Number of samples read at a time.
+
+    Yields:
+    - tuple: The absolute start index of the frame, the frame and its DC samples.
+    """
+    candidate = None  # the last low sample seen and the frame window it would start
+    pending = []  # confirmed frame windows waiting for samples
+    # the last n_dc samples of the previous chunks, the DC history of a frame starting
+    # less than n_dc samples into the chunk begins there
+    history = np.empty(0, dtype=np.complex64)
+    base = 0
+
+    def new_window(anchor):
+        window = _FrameWindow(anchor + n_t1, n_dc, n_rn16)
+        window.fill(history, base - len(history))
+        window.fill(chunk, base)
+        return window
+
+    for chunk in _iter_chunks(sig, chunk_size):
+        low = np.flatnonzero(np.abs(chunk) < threshold) + base
+        for window in pending:
+            window.fill(chunk, base)
+
+        if candidate is not None:
+            candidate[1].fill(chunk, base)
+            if len(low) and low[0] - candidate[0] > n_max_gap:
+                pending.append(candidate[1])
+        anchors = low[:-1][np.diff(low) > n_max_gap]
+        pending.extend(new_window(anchor) for anchor in anchors)
+        if len(low):
+            candidate = (low[-1], new_window(low[-1]))
+
+        base += len(chunk)
+        if n_dc:
+            history = np.concatenate((history, chunk[-n_dc:]))[-n_dc:]
+        while pending and (pending[0].complete() or pending[0].begin < 0):
+            window = pending[0]
+            # the sample right after the frame must exist, as in `extract_rn16_frames`
+            if window.begin >= 0 and window.start + n_rn16 >= base:
+                break
+            pending.pop(0)
+            if window.begin >= 0:
+                yield (
+                    window.start,
+                    window.samples[n_dc:],
+                    window.samples[:n_dc],
+                )
+
+
+def extract_rn16_frames_chunked(sig, n_max_gap, n_t1, n_rn16, **kwargs):
+    """
+    Same as `extract_rn16_frames`, but streams the capture with `iter_rn16_frames`.
 
     Returns:
     - frames (numpy.ndarray): Extracted RN16 frames.
     - frames_dc (numpy.ndarray): Estimated DC component of each frame.
+    - starts (numpy.ndarray): Absolute start index of each frame.
     """
-    idx = np.argwhere(np.abs(sig) < 0.005).reshape(-1)
-    idx = idx[np.argwhere(np.diff(idx) > n_max_gap).reshape(-1)]
-    bs_start = idx + n_t1
-    bs_end = bs_start + n_rn16
-    frames = []
-    frames_dc = []
-    for start, end in zip(bs_start, bs_end):
-        if start >= len(sig) or end >= len(sig):
-            continue
-        pkt = sig[start:end]
-        frames.append(pkt)
-        frames_dc.append(sig[start - 200 : start])
-    frames = np.array(frames)
-    frames_dc = np.array(frames_dc)
-    return frames, frames_dc
+    n_dc = kwargs.get("n_dc", 200)
+    starts, frames, frames_dc = [], [], []
+    for start, frame, dc in iter_rn16_frames(sig, n_max_gap, n_t1, n_rn16, **kwargs):
+        starts.append(start)
+        frames.append(frame)
+        frames_dc.append(dc)
+    frames = np.array(frames, dtype=np.complex64).reshape(len(starts), n_rn16)
+    frames_dc = np.array(frames_dc, dtype=np.complex64).reshape(len(starts), n_dc)
+    return frames, frames_dc, np.array(starts, dtype=np.int64)
 
 
 def frame_sync(frame):
@@ -51,6 +195,100 @@ def frame_sync(frame):
     return frame_start, h_est
 
 
+FM0_PREAMBLE = [1, 1, 0, 1, 0, 0, 1, 0, 0, 0, 1, 1]
+
+
+@functools.lru_cache
+def _preamble_spectrum(sps, n_corr):
+    preamble = np.repeat(FM0_PREAMBLE, sps)
+    n_fft = fft.next_fast_len(len(preamble) + n_corr + len(preamble) - 1)
+    return np.conj(fft.fft(preamble, n_fft)), np.flatnonzero(preamble)
+
+
+def frame_sync_batch(frames, dc_means=None, sps=25, n_corr=100):
+    """
+    Synchronizes many frames at once, see `frame_sync`.
+
+    The preamble is correlated with all frames in one FFT over axis 1, using a cached
+    preamble spectrum.
+
+    Parameters:
+    - frames (ndarray): The input frames, shape (n_frames, n_samples).
+    - dc_means (ndarray, optional): The DC component of each frame, removed before correlating.
+    - sps (int): Number of samples per FM0 symbol.
+    - n_corr (int): Number of candidate preamble positions searched.
+
+    Returns:
+    - tuple: The frame start positions and the estimated channel responses. The channel
+      responses are the mean preamble high level of the frames as given, DC included.
+    """
+    frames = np.asarray(frames)
+    spectrum, ones = _preamble_spectrum(sps, n_corr)
+    n_preamble = len(FM0_PREAMBLE) * sps
+    n_fft = len(spectrum)
+    x = frames[:, : n_preamble + n_corr]
+    if dc_means is not None:
+        x = x - np.asarray(dc_means)[:, np.newaxis]
+    corr = fft.ifft(fft.fft(x, n_fft, axis=1) * spectrum, axis=1)
+    # same as `signal.correlate(..., "same")`: output k is the preamble delayed by k - n/2
+    lags = np.arange(x.shape[1]) - n_preamble // 2
+    corr = np.abs(corr[:, lags % n_fft])
+    frame_start = np.maximum(0, np.argmax(corr, axis=1) - n_preamble // 2)
+    rows = np.arange(len(frames))[:, np.newaxis]
+    h_est = np.mean(frames[rows, frame_start[:, np.newaxis] + ones], axis=1)
+    return frame_start, h_est
+
+
+def quantiles(data, q=(0.25, 0.75), axis=-1):
+    """
+    Computes quantiles along an axis with a single `np.partition`.
+
+    The result is the same as `np.quantile(data, q, axis=axis)` with linear interpolation,
+    but every quantile is taken from one partial sort and the quantiles are stacked on
+    the last axis.
+
+    Parameters:
+    - data (array-like): The data, without NaNs.
+    - q (sequence of float, optional): The quantiles to compute, in [0, 1]. Defaults to the quartiles.
+    - axis (int, optional): The axis along which the quantiles are computed. Defaults to -1.
+
+    Returns:
+    - numpy.ndarray: The quantiles, shape `data.shape` without `axis` plus `(len(q),)`.
+    """
+    data = np.moveaxis(np.asarray(data), axis, -1)
+    n = data.shape[-1]
+    virtual = np.asarray(q, dtype=np.float64) * (n - 1)
+    lo = np.floor(virtual).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    t = virtual - lo
+    data = np.partition(data, np.unique(np.concatenate((lo, hi))), axis=-1)
+    a = data[..., lo]
+    b = data[..., hi]
+    # same interpolation as np.quantile, exact at both ends
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def outlier_mask(data, m=2, axis=-1):
+    """
+    Finds the outliers along an axis, the values not strictly within `m` iqrs of the
+    quartiles.
+
+    Parameters:
+    - data (array-like): The data, e.g. the magnitudes of the inter-channel estimates of
+      several tag pairs, one per row.
+    - m (float, optional): The number of iqrs to consider as the threshold for outliers. Defaults to 2.
+    - axis (int, optional): The axis along which the quartiles are computed. Defaults to -1.
+
+    Returns:
+    - numpy.ndarray: A boolean mask of the outliers, same shape as `data`.
+    """
+    data = np.asarray(data)
+    q1, q3 = np.expand_dims(np.moveaxis(quantiles(data, axis=axis), -1, 0), axis % data.ndim + 1)
+    iqr_ = q3 - q1
+    return ~((data > q1 - m * iqr_) & (data < q3 + m * iqr_))
+
+
 def arg_outliers(data, m=2):
     """
     Find the indices of outliers in a given dataset.
@@ -62,8 +300,4 @@ def arg_outliers(data, m=2):
     Returns:
     numpy.ndarray: An array of indices corresponding to the outliers in the dataset.
     """
-    q1 = np.percentile(data, 25)
-    q3 = np.percentile(data, 75)
-    iqr_ = iqr(data)
-    mask = (data > q1 - m * iqr_) & (data < q3 + m * iqr_)
-    return np.argwhere(mask == 0).flatten()
+    return np.flatnonzero(outlier_mask(np.ravel(data), m))
@@ -0,0 +1,299 @@
+"""
+Benchmarks the signal-processing hot paths on synthetic inputs.
+
+Every case is timed with `timeit` and its peak Python/NumPy memory is measured with
+`tracemalloc` (memory allocated by C++ extensions outside NumPy arrays is not counted).
+Results are written as JSON so that runs can be compared across commits:
+
+    python scripts/benchmark.py -o before.json
+    git checkout other-commit
+    python scripts/benchmark.py -o after.json --compare before.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "lib"), os.path.join(ROOT, "grc")]
+
+import crc  # noqa: E402
+import numpy as np  # noqa: E402
+from command_gen import reader_cmd_gen  # noqa: E402
+from dpc import DPC  # noqa: E402
+from inter_channel import process_one_frame  # noqa: E402
+from rfid import PulseIntervalEncoder  # noqa: E402
+from utils import (  # noqa: E402
+    FM0_PREAMBLE,
+    extract_rn16_frames,
+    frame_sync,
+    frame_sync_batch,
+)
+
+try:
+    from extract_inter_channel_cxx import extract_inter_channel
+except ImportError:
+    extract_inter_channel = None
+
+SAMP_RATE = 2e6
+SPS = 25
+N_T1 = 470
+N_MAX_GAP = 440
+N_RN16 = 1250
+N_DC = 200
+
+
+def synth_frames(n_frames, n, rng, noise=0.0003):
+    """
+    Two tags replying together, the first one starting with the FM0 preamble, so that
+    every frame has four IQ levels. The noise is low enough for `cluster_frame` to find
+    them. Returns the frames, shape (n_frames, n), and the samples preceding them, shape
+    (n_frames, N_DC).
+    """
+    dc = 0.30 + 0.10j
+    h1, h2 = 0.03 + 0.01j, 0.01 - 0.02j
+    n_symbols = -(-n // SPS)
+    bits1 = np.concatenate(
+        (
+            np.broadcast_to(FM0_PREAMBLE, (n_frames, len(FM0_PREAMBLE))),
+            rng.integers(0, 2, (n_frames, n_symbols)),
+        ),
+        axis=1,
+    )
+    bits2 = rng.integers(0, 2, (n_frames, n_symbols + len(FM0_PREAMBLE)))
+    levels = h1 * np.repeat(bits1, SPS, axis=1) + h2 * np.repeat(bits2, SPS, axis=1)
+    frames = dc + levels[:, :n]
+    frames += noise * (
+        rng.standard_normal(frames.shape) + 1j * rng.standard_normal(frames.shape)
+    )
+    dcs = dc + noise * (
+        rng.standard_normal((n_frames, N_DC)) + 1j * rng.standard_normal((n_frames, N_DC))
+    )
+    return frames.astype(np.complex64), dcs.astype(np.complex64)
+
+
+def synth_capture(n_samples, rng, noise=0.001):
+    """
+    The reader commands of `command_gen` repeated over `n_samples`, with a two-tag reply
+    `N_T1` samples after each command.
+    """
+    tx = reader_cmd_gen(SAMP_RATE, "all")
+    tx = np.tile(tx, -(-n_samples // len(tx)))[:n_samples]
+    sig = tx * (0.3 + 0.1j)
+    sig += noise * (rng.standard_normal(n_samples) + 1j * rng.standard_normal(n_samples))
+    low = np.flatnonzero(np.abs(tx) < 0.5)
+    starts = low[:-1][np.diff(low) > N_MAX_GAP] + N_T1
+    starts = starts[starts + N_RN16 < n_samples]
+    replies, _ = synth_frames(len(starts), N_RN16, rng, noise=0)
+    idx = starts[:, np.newaxis] + np.arange(N_RN16)
+    sig[idx] += replies - (0.30 + 0.10j)
+    return sig.astype(np.complex64)
+
+
+def seeded(*seed):
+    # every input has its own generator, so it does not depend on the selected cases
+    return np.random.default_rng(seed)
+
+
+def cases(quick=False):
+    """
+    Yields (name, params, setup) for every benchmark case. `setup` builds the inputs and
+    returns the function to measure, so that only the inputs of the selected cases are
+    built and only the returned function is measured.
+    """
+    frame_sizes = [575, 1150] if quick else [575, 1150, 2300]
+    capture_lengths = [1 << 20] if quick else [1 << 20, 1 << 22, 1 << 24]
+    batch_sizes = [1, 100] if quick else [1, 100, 1000]
+    # the C++ clustering costs tens of ms per frame
+    cxx_batch_sizes = [1, 8] if quick else [1, 8, 32]
+
+    @functools.lru_cache
+    def frames_of_size(n):
+        return synth_frames(max(batch_sizes + cxx_batch_sizes), n, seeded(n))
+
+    for as_array in [False, True]:
+        for n_bits in [22, 96, 1024]:
+
+            def setup(as_array=as_array, n_bits=n_bits):
+                pie = PulseIntervalEncoder(SAMP_RATE, as_array=as_array)
+                bits = seeded(n_bits).integers(0, 2, n_bits).tolist()
+                return lambda: pie.encode(bits)
+
+            yield "pie_encode", {"n_bits": n_bits, "as_array": as_array}, setup
+
+    for tag_filter in ["all", "1,2"]:
+        yield "reader_cmd_gen", {"filter": tag_filter}, (
+            lambda tag_filter=tag_filter: lambda: reader_cmd_gen(SAMP_RATE, tag_filter)
+        )
+
+    backend = "epc_crc" if crc.epc_crc is not None else "numpy"
+    for n_rows in batch_sizes:
+        for n_bits in [22, 128]:
+            params = {"n_rows": n_rows, "n_bits": n_bits, "backend": backend}
+            for name, fn in [("crc5", crc.crc5_bits), ("crc16", crc.crc16_bits)]:
+
+                def setup(n_rows=n_rows, n_bits=n_bits, fn=fn):
+                    bits = seeded(n_rows, n_bits).integers(
+                        0, 2, (n_rows, n_bits), dtype=np.uint8
+                    )
+                    return lambda: fn(bits)
+
+                yield name, params, setup
+
+    for n_samples in capture_lengths:
+
+        def setup(n_samples=n_samples):
+            sig = synth_capture(n_samples, seeded(n_samples))
+            return lambda: extract_rn16_frames(sig, N_MAX_GAP, N_T1, N_RN16, N_DC)
+
+        yield "extract_rn16_frames", {"n_samples": n_samples}, setup
+
+    for n in frame_sizes:
+
+        def setup(n=n):
+            frame = frames_of_size(n)[0][0]
+            return lambda: frame_sync(frame)
+
+        yield "frame_sync", {"n": n}, setup
+        for n_frames in batch_sizes[1:]:
+
+            def setup(n=n, n_frames=n_frames):
+                frames, dcs = frames_of_size(n)
+                f, d = frames[:n_frames], dcs[:n_frames]
+                return lambda: frame_sync_batch(f, np.mean(d, axis=1))
+
+            yield "frame_sync_batch", {"n": n, "n_frames": n_frames}, setup
+        for algorithm in ["exact", "blocked", "grid"]:
+
+            def setup(n=n, algorithm=algorithm):
+                frame = frames_of_size(n)[0][0]
+                return lambda: DPC(
+                    n_clusters=4, filter_halo=True, algorithm=algorithm
+                ).fit(frame)
+
+            yield "dpc_fit", {"n": n, "algorithm": algorithm}, setup
+
+        def setup(n=n):
+            frames, dcs = frames_of_size(n)
+            return lambda: process_one_frame(frames[0], dcs[0])
+
+        yield "process_one_frame", {"n": n}, setup
+        if extract_inter_channel is not None:
+            for n_frames in cxx_batch_sizes:
+
+                def setup(n=n, n_frames=n_frames):
+                    frames, dcs = frames_of_size(n)
+                    f, d = frames[:n_frames], dcs[:n_frames]
+                    return lambda: extract_inter_channel(
+                        f, d, np.mean(d), d.mean(axis=1) + 0.03 + 0.01j
+                    )
+
+                yield "extract_inter_channel_cxx", {"n": n, "n_frames": n_frames}, setup
+
+
+def measure(fn, repeat, min_time):
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time and number < 1 << 20:
+        number *= 2
+    times = [t / number for t in timer.repeat(repeat, number)]
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "time": {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "number": number,
+            "repeat": repeat,
+        },
+        "peak_memory": peak,
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline):
+    base = {key(r): r for r in baseline["results"]}
+    print(f"{'case':<60} {'time':>10} {'ratio':>7} {'memory':>8}", file=sys.stderr)
+    for r in results:
+        b = base.get(key(r))
+        t = r["time"]["median"]
+        name = f"{r['name']} {r['params']}"
+        if b is None:
+            print(f"{name:<60} {t * 1e3:>8.3f}ms {'new':>7}", file=sys.stderr)
+            continue
+        ratio = t / b["time"]["median"]
+        mem = r["peak_memory"] / max(b["peak_memory"], 1)
+        print(f"{name:<60} {t * 1e3:>8.3f}ms {ratio:>6.2f}x {mem:>7.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("-o", "--output", help="JSON file to write, stdout by default")
+    parser.add_argument("-k", "--filter", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per case")
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="minimum seconds per timing repeat"
+    )
+    parser.add_argument("--quick", action="store_true", help="smaller inputs")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = []
+    for name, params, setup in cases(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        fn = setup()
+        result = {"name": name, "params": params, **measure(fn, args.repeat, args.min_time)}
+        results.append(result)
+        print(
+            f"{name} {params}: {result['time']['median'] * 1e3:.3f} ms, "
+            f"{result['peak_memory'] / 2**20:.2f} MiB",
+            file=sys.stderr,
+        )
+
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
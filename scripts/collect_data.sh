@@ -43,6 +43,7 @@ done
 
 for i in "${!filters[@]}"; do
     gum spin --title="Processing $path/${names[$i]}.cf32" -- ./build/split_rn16 "$path/${names[$i]}.cf32" "$path/${names[$i]}.npz"
+    gum spin --title="Converting $path/${names[$i]}.npz" -- env PYTHONPATH=lib python3 scripts/convert_npz.py "$path/${names[$i]}.npz"
 done
 
 gum style --bold --foreground=2 "Data successfully saved to $path"
@@ -0,0 +1,11 @@
+import sys
+
+from dataset import convert_npz
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <npz_file>...")
+        sys.exit(1)
+    for npz_path in sys.argv[1:]:
+        dataset = convert_npz(npz_path)
+        print(f"{npz_path} -> {dataset.path} ({len(dataset)} frames)")
@@ -1,3 +1,5 @@
+import numpy as np
+import crc
 from epc_crc import crc5, crc16
 
 
@@ -78,3 +80,54 @@ print(
         ]
     )
 )
+
+
+# cross-check the NumPy fallback against the C implementation
+rng = np.random.default_rng(0)
+for n_bits in range(0, 260):
+    bits = rng.integers(0, 2, (64, n_bits), dtype=np.uint8)
+    packed = np.packbits(bits, axis=1)
+    assert np.array_equal(crc._crc5.bits(bits), crc.epc_crc.crc5_bits(bits))
+    assert np.array_equal(crc._crc16.bits(bits), crc.epc_crc.crc16_bits(bits))
+    assert np.array_equal(
+        crc._crc16.packed(packed, n_bits), crc.epc_crc.crc16_packed(packed, n_bits)
+    )
+    assert crc._crc5_list(bits[0].tolist()) == crc5(bits[0].tolist())
+    assert crc._crc16_list(bits[0].tolist()) == crc16(bits[0].tolist())
+    assert crc5_py(bits[0].tolist()) == crc5(bits[0].tolist())
+    if n_bits >= 16:
+        assert np.array_equal(crc._check_crc16(bits), crc.epc_crc.check_crc16(bits))
+        crc_bytes = crc._crc16.bits(bits).astype(">u2").view(np.uint8)
+        frames = np.hstack((bits, np.unpackbits(crc_bytes.reshape(-1, 2), axis=1)))
+        assert crc._check_crc16(frames).all()
+        assert crc.epc_crc.check_crc16(frames).all()
+print("NumPy fallback matches epc_crc")
+
+
+def outcome(fn, *args):
+    try:
+        result = fn(*args)
+    except ValueError as e:
+        return "ValueError", str(e)
+    return type(result).__name__, np.asarray(result).tolist()
+
+
+# both backends accept and reject the same inputs
+frame = rng.integers(0, 2, 40, dtype=np.uint8)
+for bits in [frame, frame[np.newaxis].repeat(3, axis=0)]:
+    for dtype in [np.uint8, np.bool_, np.int8, np.int64]:
+        b = bits.astype(dtype)
+        packed = np.packbits(bits, axis=-1)
+        if dtype is not np.uint8:
+            packed = packed.astype(dtype)
+        pairs = [
+            (crc._crc5.bits, crc.epc_crc.crc5_bits, b),
+            (crc._crc16.bits, crc.epc_crc.crc16_bits, b),
+            (crc._check_crc16, crc.epc_crc.check_crc16, b),
+            (crc._crc5.packed, crc.epc_crc.crc5_packed, packed, 40),
+            (crc._crc16.packed, crc.epc_crc.crc16_packed, packed, 40),
+            (crc._crc16.check, crc.epc_crc.check_crc16_packed, packed, 40),
+        ]
+        for fallback, c, *args in pairs:
+            assert outcome(fallback, *args) == outcome(c, *args), (c.__name__, dtype, bits.ndim)
+print("NumPy fallback accepts the same inputs as epc_crc")
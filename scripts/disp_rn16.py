@@ -5,6 +5,8 @@ import matplotlib.animation as animation
 import seaborn as sns
 import sys
 
+from dataset import open_rn16
+
 
 colors = ["gray"] + [plt.get_cmap("tab10")(i) for i in range(0, 4)]
 custom_cmap = mcolors.ListedColormap(colors)
@@ -12,7 +14,7 @@ custom_cmap = mcolors.ListedColormap(colors)
 
 sns.set_theme()
 
-data = np.load(sys.argv[1])
+data = open_rn16(sys.argv[1])
 rn16_frames = data["frames"]
 rn16_labels = data["labels"]
 rn16_inter_channels = data["inter_est"]
@@ -0,0 +1,38 @@
+import numpy as np
+from utils import (
+    extract_rn16_frames,
+    extract_rn16_frames_chunked,
+    rn16_frame_windows,
+)
+
+# a reader signal with short low runs at random intervals, each gap starting a frame
+rng = np.random.default_rng(0)
+n_samples = 1 << 20
+sig = (0.3 + 0.01 * rng.standard_normal(n_samples)).astype(np.complex64)
+run_starts = np.cumsum(rng.integers(1000, 6000, n_samples // 1000))
+run_starts = run_starts[run_starts < n_samples - 10]
+sig[run_starts[:, np.newaxis] + np.arange(10)] = 0
+
+for n_t1, n_dc in [(470, 200), (150, 200), (0, 200), (150, 0)]:
+    frames, frames_dc = extract_rn16_frames(sig, 440, n_t1, 1250, n_dc)
+    windows, rows = rn16_frame_windows(sig, 440, n_t1, 1250, n_dc)
+    assert np.shares_memory(windows, sig)
+    assert np.array_equal(windows[rows, n_dc:], frames)
+    assert np.array_equal(windows[rows, :n_dc], frames_dc)
+    for chunk_size in [4096, 1000, 150, 1 << 20]:
+        chunked, chunked_dc, starts = extract_rn16_frames_chunked(
+            sig, 440, n_t1, 1250, n_dc=n_dc, chunk_size=chunk_size
+        )
+        assert len(frames) > 100
+        assert np.array_equal(frames, chunked), (n_t1, n_dc, chunk_size, len(chunked))
+        assert np.array_equal(frames_dc, chunked_dc)
+        assert np.array_equal(sig[starts[:, np.newaxis] + np.arange(1250)], chunked)
+print("iter_rn16_frames matches extract_rn16_frames")
+
+# captures shorter than a frame have no frames
+for n in [0, 10, 1449]:
+    frames, frames_dc = extract_rn16_frames(sig[:n], 440, 470, 1250)
+    assert frames.shape == (0, 1250) and frames_dc.shape == (0, 200)
+    windows, rows = rn16_frame_windows(sig[:n], 440, 470, 1250)
+    assert len(rows) == 0
+print("extract_rn16_frames handles short captures")
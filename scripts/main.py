@@ -17,6 +17,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from catalog import Catalog
+from dataset import open_rn16
 from utils import arg_outliers
 
 sns.set_theme()
@@ -26,8 +28,8 @@ pt = 1 / 72
 
 # %%
 for i in range(1, 4):
-    data12 = np.load(f"../data/2024-06-04/1-2#{i}.npz")
-    data32 = np.load(f"../data/2024-06-04/3-2#{i}.npz")
+    data12 = open_rn16(f"../data/2024-06-04/1-2#{i}.npz")
+    data32 = open_rn16(f"../data/2024-06-04/3-2#{i}.npz")
 
     frames12 = data12["frames"]
     frames32 = data32["frames"]
@@ -88,52 +90,52 @@ distances = [7, 8, 9, 10, 11]
 
 df = None
 
-for path, distance in zip(datas_path, distances):
-    data12 = np.load(f"{path}/1-2.npz")
-    data13 = np.load(f"{path}/1-3.npz")
-    # data23 = np.load(f"{path}/2-3.npz")
-
-    inter_est12 = data12["inter_est"][:100]
-    inter_est13 = data13["inter_est"][:100]
-    # inter_est23 = data23["inter_est"]
-
-    outliers12 = arg_outliers(np.abs(inter_est12))
-    outliers13 = arg_outliers(np.abs(inter_est13))
-    # outliers23 = arg_outliers(np.abs(inter_est23))
-
-    inter_est12_filtered = np.delete(inter_est12, outliers12)
-    inter_est13_filtered = np.delete(inter_est13, outliers13)
-    # inter_est23_filtered = np.delete(inter_est23, outliers23)
-
-    df_tmp = pd.DataFrame(
-        {
-            "Inter-channel magnitude": np.hstack(
-                (
-                    np.abs(inter_est12_filtered),
-                    np.abs(inter_est13_filtered),
-                    # np.abs(inter_est23_filtered),
-                )
-            ),
-            "Inter-channel phase": np.hstack(
-                (
-                    np.angle(inter_est12_filtered),
-                    np.angle(inter_est13_filtered),
-                    # np.angle(inter_est23_filtered),
-                )
-            ),
-            "Channel": ["Tag1-Tag2"] * len(inter_est12_filtered)
-            + ["Tag1-Tag3"] * len(inter_est13_filtered),
-            # + ["Tag2-Tag3"] * len(inter_est23_filtered),
-            "Distance": [f"{distance}cm"]
-            * (
-                len(inter_est12_filtered)
-                + len(inter_est13_filtered)
-                # + len(inter_est23_filtered)
-            ),
-        }
-    )
-
-    df = pd.concat([df, df_tmp])
+with Catalog("../data/catalog.sqlite") as catalog:
+    for path, distance in zip(datas_path, distances):
+        captures = catalog.scan(path, distances={path: distance})
+        captures = {capture.pair: capture for capture in captures}
+
+        inter_est12 = catalog.array(captures["1-2"], "inter_est")[:100]
+        inter_est13 = catalog.array(captures["1-3"], "inter_est")[:100]
+        # inter_est23 = catalog.array(captures["2-3"], "inter_est")
+
+        outliers12 = arg_outliers(np.abs(inter_est12))
+        outliers13 = arg_outliers(np.abs(inter_est13))
+        # outliers23 = arg_outliers(np.abs(inter_est23))
+
+        inter_est12_filtered = np.delete(inter_est12, outliers12)
+        inter_est13_filtered = np.delete(inter_est13, outliers13)
+        # inter_est23_filtered = np.delete(inter_est23, outliers23)
+
+        df_tmp = pd.DataFrame(
+            {
+                "Inter-channel magnitude": np.hstack(
+                    (
+                        np.abs(inter_est12_filtered),
+                        np.abs(inter_est13_filtered),
+                        # np.abs(inter_est23_filtered),
+                    )
+                ),
+                "Inter-channel phase": np.hstack(
+                    (
+                        np.angle(inter_est12_filtered),
+                        np.angle(inter_est13_filtered),
+                        # np.angle(inter_est23_filtered),
+                    )
+                ),
+                "Channel": ["Tag1-Tag2"] * len(inter_est12_filtered)
+                + ["Tag1-Tag3"] * len(inter_est13_filtered),
+                # + ["Tag2-Tag3"] * len(inter_est23_filtered),
+                "Distance": [f"{distance}cm"]
+                * (
+                    len(inter_est12_filtered)
+                    + len(inter_est13_filtered)
+                    # + len(inter_est23_filtered)
+                ),
+            }
+        )
+
+        df = pd.concat([df, df_tmp])
 
 df
 
@@ -1,7 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from utils import extract_rn16_frames, frame_sync
+from utils import extract_rn16_frames, frame_sync_batch
 
 from extract_inter_channel_cxx import extract_inter_channel
 
@@ -11,16 +11,12 @@ rn16_frames, rn16_frames_dc = extract_rn16_frames(
     sig, n_max_gap=440, n_t1=470, n_rn16=1250
 )
 
-s_int_all = []
+frame_starts, h_ests = frame_sync_batch(rn16_frames, np.mean(rn16_frames_dc, axis=1))
 
-for frame, dc in zip(rn16_frames, rn16_frames_dc):
-    dc_est = np.mean(rn16_frames_dc)
-    frame_start, h_est = frame_sync(frame - np.mean(dc))
-    h_est += np.mean(dc)
-    frame = frame[frame_start : frame_start + 1150]
-    assert len(frame) == 1150
-    s_int = extract_inter_channel(frame, dc, dc_est, h_est)
-    s_int_all.append(s_int)
+dc_est = np.mean(rn16_frames_dc)
+frames = np.lib.stride_tricks.sliding_window_view(rn16_frames, 1150, axis=1)
+frames = np.ascontiguousarray(frames[np.arange(len(frames)), frame_starts])
+s_int_all, labels = extract_inter_channel(frames, rn16_frames_dc, dc_est, h_ests)
 
 
 plt.figure()
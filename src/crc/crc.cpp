@@ -1,6 +1,11 @@
+#include "crc.hpp"
+
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <algorithm>
+#include <stdexcept>
 #include <vector>
 
 extern "C" {
@@ -8,53 +13,182 @@ extern "C" {
 #include "crc5epc_c1g2.h"
 }
 
-std::vector<int> crc5(std::vector<int> bits) {
-  int n_byte = bits.size() / 8;
-  int n_rem = bits.size() % 8;
-  unsigned char data[n_byte];
-  for (int i = 0; i < n_byte; i++) {
-    data[i] = 0;
-    for (int j = 0; j < 8; j++) {
-      data[i] |= bits[i * 8 + j] << (7 - j);
-    }
-  }
+namespace py = pybind11;
+
+// Register contents after running CRC-16/GENIBUS over a message followed by its own CRC.
+const uint16_t CRC16_RESIDUE = 0x1D0F;
+
+uint8_t crc5_value(const uint8_t *data, size_t n_bits) {
+  size_t n_byte = n_bits / 8;
+  unsigned n_rem = n_bits % 8;
   uint8_t crc = n_byte == 0 ? 0x09 : crc5epc_c1g2_byte(0x9, data, n_byte);
-  unsigned rem = 0;
-  for (int i = 0; i < n_rem; i++) {
-    rem |= bits[n_byte * 8 + i] << (7 - i);
+  return n_rem == 0 ? crc : crc5epc_c1g2_rem(crc, data[n_byte], n_rem);
+}
+
+uint16_t crc16_value(const uint8_t *data, size_t n_bits) {
+  size_t n_byte = n_bits / 8;
+  unsigned n_rem = n_bits % 8;
+  uint16_t crc = n_byte == 0 ? 0x0000 : crc16genibus_byte(0x0000, data, n_byte);
+  return n_rem == 0 ? crc : crc16genibus_rem(crc, data[n_byte], n_rem);
+}
+
+static void pack_bits(const uint8_t *bits, size_t n_bits, uint8_t *packed) {
+  std::fill(packed, packed + (n_bits + 7) / 8, 0);
+  for (size_t i = 0; i < n_bits; i++) {
+    packed[i / 8] |= (bits[i] != 0) << (7 - i % 8);
+  }
+}
+
+static std::vector<uint8_t> pack_bits(const std::vector<int> &bits) {
+  std::vector<uint8_t> packed((bits.size() + 7) / 8, 0);
+  for (size_t i = 0; i < bits.size(); i++) {
+    packed[i / 8] |= (bits[i] != 0) << (7 - i % 8);
   }
-  crc = crc5epc_c1g2_rem(crc, rem, n_rem);
-  std::vector<int> crc_bits(5);
-  for (int i = 0; i < 5; i++) {
-    crc_bits[4 - i] = crc >> i & 1;
+  return packed;
+}
+
+template <typename T>
+static std::vector<int> to_bits(T crc, int width) {
+  std::vector<int> crc_bits(width);
+  for (int i = 0; i < width; i++) {
+    crc_bits[width - 1 - i] = crc >> i & 1;
   }
   return crc_bits;
 }
 
-std::vector<int> crc16(std::vector<int> bits) {
-  int n_byte = bits.size() / 8;
-  int n_rem = bits.size() % 8;
-  unsigned char data[n_byte];
-  for (int i = 0; i < n_byte; i++) {
-    data[i] = 0;
-    for (int j = 0; j < 8; j++) {
-      data[i] |= bits[i * 8 + j] << (7 - j);
+std::vector<int> crc5(const std::vector<int> &bits) {
+  return to_bits(crc5_value(pack_bits(bits).data(), bits.size()), 5);
+}
+
+std::vector<int> crc16(const std::vector<int> &bits) {
+  return to_bits(crc16_value(pack_bits(bits).data(), bits.size()), 16);
+}
+
+// A 1-D or 2-D buffer of bytes whose last axis is contiguous, viewed without copying.
+struct byte_rows {
+  const uint8_t *ptr;
+  ssize_t n_rows;
+  ssize_t row_len;
+  ssize_t row_stride;
+  bool is_1d;
+
+  byte_rows(const py::buffer &buf) {
+    py::buffer_info info = buf.request();
+    if (info.itemsize != 1) {
+      throw std::invalid_argument("Expected a buffer of uint8 items.");
+    }
+    if (info.ndim != 1 && info.ndim != 2) {
+      throw std::invalid_argument("Expected a 1-D or 2-D buffer.");
+    }
+    is_1d = info.ndim == 1;
+    ptr = static_cast<const uint8_t *>(info.ptr);
+    n_rows = is_1d ? 1 : info.shape[0];
+    row_len = info.shape[info.ndim - 1];
+    row_stride = is_1d ? row_len : info.strides[0];
+    if (row_len > 1 && info.strides[info.ndim - 1] != 1) {
+      throw std::invalid_argument("The last axis of the buffer must be contiguous.");
     }
   }
-  uint16_t crc = n_byte == 0 ? 0x0000 : crc16genibus_byte(0x0000, data, n_byte);
-  unsigned rem = 0;
-  for (int i = 0; i < n_rem; i++) {
-    rem |= bits[n_byte * 8 + i] << (7 - i);
+
+  const uint8_t *row(ssize_t i) const { return ptr + i * row_stride; }
+};
+
+template <typename T, T (*crc_fn)(const uint8_t *, size_t)>
+static py::object crc_packed(py::buffer data, size_t n_bits) {
+  byte_rows rows(data);
+  if (n_bits > static_cast<size_t>(rows.row_len) * 8) {
+    throw std::invalid_argument("n_bits exceeds the length of the buffer.");
   }
-  crc = crc16genibus_rem(crc, rem, n_rem);
-  std::vector<int> crc_bits(16);
-  for (int i = 0; i < 16; i++) {
-    crc_bits[15 - i] = crc >> i & 1;
+  py::array_t<T> crcs(rows.n_rows);
+  T *out = crcs.mutable_data();
+  {
+    py::gil_scoped_release release;
+#pragma omp parallel for
+    for (ssize_t i = 0; i < rows.n_rows; i++) {
+      out[i] = crc_fn(rows.row(i), n_bits);
+    }
   }
-  return crc_bits;
+  if (rows.is_1d) {
+    return py::int_(out[0]);
+  }
+  return std::move(crcs);
+}
+
+template <typename T, T (*crc_fn)(const uint8_t *, size_t)>
+static py::object crc_bits(py::buffer bits) {
+  byte_rows rows(bits);
+  size_t n_bits = rows.row_len;
+  py::array_t<T> crcs(rows.n_rows);
+  T *out = crcs.mutable_data();
+  {
+    py::gil_scoped_release release;
+#pragma omp parallel
+    {
+      std::vector<uint8_t> packed((n_bits + 7) / 8 + 1);
+#pragma omp for
+      for (ssize_t i = 0; i < rows.n_rows; i++) {
+        pack_bits(rows.row(i), n_bits, packed.data());
+        out[i] = crc_fn(packed.data(), n_bits);
+      }
+    }
+  }
+  if (rows.is_1d) {
+    return py::int_(out[0]);
+  }
+  return std::move(crcs);
+}
+
+static py::array_t<bool> check_crc16_rows(const byte_rows &rows, size_t n_bits, bool packed) {
+  if (n_bits < 16) {
+    throw std::invalid_argument("Frames must be at least 16 bits long.");
+  }
+  py::array_t<bool> valid(rows.n_rows);
+  bool *out = valid.mutable_data();
+  {
+    py::gil_scoped_release release;
+#pragma omp parallel
+    {
+      std::vector<uint8_t> buf((n_bits + 7) / 8 + 1);
+#pragma omp for
+      for (ssize_t i = 0; i < rows.n_rows; i++) {
+        const uint8_t *data = rows.row(i);
+        if (!packed) {
+          pack_bits(data, n_bits, buf.data());
+          data = buf.data();
+        }
+        out[i] = static_cast<uint16_t>(~crc16_value(data, n_bits)) == CRC16_RESIDUE;
+      }
+    }
+  }
+  return valid;
+}
+
+py::array_t<bool> check_crc16(py::buffer bits) {
+  byte_rows rows(bits);
+  return check_crc16_rows(rows, rows.row_len, false);
+}
+
+py::array_t<bool> check_crc16_packed(py::buffer data, size_t n_bits) {
+  byte_rows rows(data);
+  if (n_bits > static_cast<size_t>(rows.row_len) * 8) {
+    throw std::invalid_argument("n_bits exceeds the length of the buffer.");
+  }
+  return check_crc16_rows(rows, n_bits, true);
 }
 
 PYBIND11_MODULE(epc_crc, m) {
-  m.def("crc5", &crc5);
-  m.def("crc16", &crc16);
+  m.def("crc5", &crc5, "CRC-5 of a list of bits, returned as a list of 5 bits.");
+  m.def("crc16", &crc16, "CRC-16 of a list of bits, returned as a list of 16 bits.");
+  m.def("crc5_packed", &crc_packed<uint8_t, crc5_value>, py::arg("data"), py::arg("n_bits"),
+        "CRC-5 of the first n_bits bits (MSB first) of a bytes buffer, or of every row of a 2-D uint8 array.");
+  m.def("crc16_packed", &crc_packed<uint16_t, crc16_value>, py::arg("data"), py::arg("n_bits"),
+        "CRC-16 of the first n_bits bits (MSB first) of a bytes buffer, or of every row of a 2-D uint8 array.");
+  m.def("crc5_bits", &crc_bits<uint8_t, crc5_value>, py::arg("bits"),
+        "CRC-5 of a 1-D uint8 array of bits, or of every row of a 2-D uint8 array of bits.");
+  m.def("crc16_bits", &crc_bits<uint16_t, crc16_value>, py::arg("bits"),
+        "CRC-16 of a 1-D uint8 array of bits, or of every row of a 2-D uint8 array of bits.");
+  m.def("check_crc16", &check_crc16, py::arg("bits"),
+        "Checks the trailing CRC-16 of every row of a 2-D uint8 array of bits.");
+  m.def("check_crc16_packed", &check_crc16_packed, py::arg("data"), py::arg("n_bits"),
+        "Checks the trailing CRC-16 of the first n_bits bits of every row of a 2-D packed uint8 array.");
 }
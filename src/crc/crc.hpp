@@ -1,6 +1,12 @@
 #pragma once
 
+#include <cstddef>
+#include <cstdint>
 #include <vector>
 
-std::vector<int> crc5(std::vector<int> bits);
-std::vector<int> crc16(std::vector<int> bits);
+// CRCs of the first n_bits bits of data, MSB first.
+uint8_t crc5_value(const uint8_t *data, size_t n_bits);
+uint16_t crc16_value(const uint8_t *data, size_t n_bits);
+
+std::vector<int> crc5(const std::vector<int> &bits);
+std::vector<int> crc16(const std::vector<int> &bits);
@@ -9,6 +9,8 @@
 
 #include "global.hpp"
 
+#pragma omp declare reduction(+ : gr_complex : omp_out += omp_in) initializer(omp_priv = gr_complex(0, 0))
+
 BivariateNormal::BivariateNormal(double variance1, double variance2) : variances(variance1, variance2) {
   // 确保方差为正
   if (variance1 <= 0 || variance2 <= 0) {
@@ -26,18 +28,18 @@ double BivariateNormal::pdf(const Eigen::Vector2d &x) const {
 
 gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std::deque<gr_complex> &dc_samples,
                                  gr_complex dc_est, gr_complex h_est, std::vector<int> &labels) {
-  int N = frame.size(), M = dc_samples.size();
+  std::vector<gr_complex> frame_vec(frame.begin(), frame.end());
+  std::vector<gr_complex> dc_vec(dc_samples.begin(), dc_samples.end());
+  labels.clear();
+  labels.resize(frame_vec.size());
+  return extract_inter_channel(frame_vec.data(), frame_vec.size(), dc_vec.data(), dc_vec.size(), dc_est, h_est,
+                               labels.data());
+}
 
-  Eigen::ArrayXcd frame_xcd(N);
-  Eigen::ArrayXcd dc_xcd(M);
-#pragma omp parallel for
-  for (int i = 0; i < N; i++) {
-    frame_xcd(i) = frame[i];
-  }
-#pragma omp parallel for
-  for (int i = 0; i < M; i++) {
-    dc_xcd(i) = dc_samples[i];
-  }
+gr_complex extract_inter_channel(const gr_complex *frame, int N, const gr_complex *dc_samples, int M,
+                                 gr_complex dc_est, gr_complex h_est, int *labels, bool parallel) {
+  Eigen::ArrayXcd frame_xcd = Eigen::Map<const Eigen::ArrayXcf>(frame, N).cast<std::complex<double>>();
+  Eigen::ArrayXcd dc_xcd = Eigen::Map<const Eigen::ArrayXcf>(dc_samples, M).cast<std::complex<double>>();
 
   // 计算 DC 的相位方差和幅度方差
   double phase_var = (dc_xcd * std::conj(dc_est)).arg().square().sum() / M;
@@ -48,7 +50,7 @@ gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std:
   // 计算距离矩阵
   Eigen::ArrayXXd dists(N, N);
 
-#pragma omp parallel for
+#pragma omp parallel for if (parallel)
   for (int i = 0; i < N; ++i) {
     for (int j = 0; j < N; ++j) {
       auto mag_diff = std::abs(frame_xcd[i]) - std::abs(frame_xcd[j]);
@@ -68,7 +70,7 @@ gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std:
   Eigen::ArrayXd deltas(N);
 
   // 计算样本密度 rhos
-#pragma omp parallel for
+#pragma omp parallel for if (parallel)
   for (int i = 0; i < N; i++) {
     rhos(i) = (-(dists.row(i).array() / dc).square()).exp().sum() - 1;
   }
@@ -77,7 +79,7 @@ gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std:
   std::sort(ordrhos.begin(), ordrhos.end(), [&rhos](int i1, int i2) { return rhos(i1) > rhos(i2); });
 
   // 计算相对距离 deltas
-#pragma omp parallel for
+#pragma omp parallel for if (parallel)
   for (int i = 1; i < N; i++) {
     int index = ordrhos[i];
     std::vector<int> index_higher_rho(ordrhos.begin(), ordrhos.begin() + i);
@@ -112,11 +114,9 @@ gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std:
   int nsamples[4] = {0, 0, 0, 0};
 
   // 使用高斯分布进行聚类
-  labels.clear();
-  labels.resize(N);
   // 相位噪声和幅度噪声应该符合高斯分布
   auto norm = BivariateNormal(mag_var, phase_var);
-#pragma omp parallel for reduction(+ : centers[ : 4], nsamples[ : 4])
+#pragma omp parallel for if (parallel) reduction(+ : centers[ : 4], nsamples[ : 4])
   for (int i = 0; i < N; i++) {
     double max_pdf = -1;
     int label = -1;
@@ -4,6 +4,7 @@
 
 #include <deque>
 #include <eigen3/Eigen/Dense>
+#include <vector>
 
 class BivariateNormal {
  public:
@@ -16,5 +17,10 @@ class BivariateNormal {
   double norm_const;
 };
 
+// Extracts the inter channel of the N samples of a frame, writing the label of every sample to labels. The loops
+// inside the frame run in parallel unless parallel is false, e.g. when frames are already processed in parallel.
+gr_complex extract_inter_channel(const gr_complex *frame, int N, const gr_complex *dc_samples, int M,
+                                 gr_complex dc_est, gr_complex h_est, int *labels, bool parallel = true);
+
 gr_complex extract_inter_channel(const std::deque<gr_complex> &frame, const std::deque<gr_complex> &dc_samples,
                                  gr_complex dc_est, gr_complex h_est, std::vector<int> &labels);
@@ -0,0 +1,211 @@
+#include "inter_channel_stats.hpp"
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+
+namespace {
+std::complex<double> unit(gr_complex z) { return std::polar(1.0, (double)std::arg(z)); }
+
+void set_phase(inter_channel_summary &s, std::complex<double> mean_unit) {
+  s.phase_mean = std::arg(mean_unit);
+  s.phase_var = 1 - std::min(1.0, std::abs(mean_unit));
+}
+}  // namespace
+
+p2_quantile::p2_quantile(double p)
+    : d_p(p),
+      d_desired{1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5},
+      d_increments{0, p / 2, p, (1 + p) / 2, 1} {
+  if (p < 0 || p > 1) {
+    throw std::invalid_argument("Invalid p value. Must be in [0, 1].");
+  }
+}
+
+void p2_quantile::update(double x) {
+  if (d_count < 5) {
+    d_heights[d_count++] = x;
+    if (d_count == 5) {
+      std::sort(d_heights.begin(), d_heights.end());
+    }
+    return;
+  }
+  d_count++;
+
+  // cell of x between the markers, the extreme markers follow the min and max
+  int k = 0;
+  for (int i = 1; i < 4; i++) {
+    k += d_heights[i] <= x;
+  }
+  d_heights[0] = std::min(d_heights[0], x);
+  d_heights[4] = std::max(d_heights[4], x);
+  for (int i = k + 1; i < 5; i++) {
+    d_positions[i] += 1;
+  }
+  for (int i = 0; i < 5; i++) {
+    d_desired[i] += d_increments[i];
+  }
+
+  auto &h = d_heights;
+  auto &n = d_positions;
+  for (int i = 1; i < 4; i++) {
+    double d = d_desired[i] - n[i];
+    if ((d >= 1 && n[i + 1] - n[i] > 1) || (d <= -1 && n[i - 1] - n[i] < -1)) {
+      d = d > 0 ? 1 : -1;
+      double parabolic = h[i] + d / (n[i + 1] - n[i - 1]) *
+                                    ((n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+                                     (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]));
+      if (h[i - 1] < parabolic && parabolic < h[i + 1]) {
+        h[i] = parabolic;
+      } else {
+        int j = i + (int)d;
+        h[i] += d * (h[j] - h[i]) / (n[j] - n[i]);
+      }
+      n[i] += d;
+    }
+  }
+}
+
+double p2_quantile::value() const {
+  if (d_count == 0) {
+    return std::numeric_limits<double>::quiet_NaN();
+  }
+  if (d_count >= 5) {
+    return d_heights[2];
+  }
+  std::array<double, 5> sorted = d_heights;
+  std::sort(sorted.begin(), sorted.begin() + d_count);
+  double virt = d_p * (d_count - 1);
+  size_t lo = (size_t)std::floor(virt);
+  size_t hi = std::min(lo + 1, d_count - 1);
+  return sorted[lo] + (sorted[hi] - sorted[lo]) * (virt - lo);
+}
+
+sliding_stats::sliding_stats(size_t size) : d_size(size) {
+  if (size == 0) {
+    throw std::invalid_argument("Invalid window value. Must be at least 1.");
+  }
+  d_window.reserve(size);
+}
+
+void sliding_stats::add(gr_complex z, double sign) {
+  double mag = std::abs(z);
+  d_sum += sign * std::complex<double>(z);
+  d_sum_unit += sign * unit(z);
+  d_sum_mag += sign * mag;
+  d_sum_mag2 += sign * mag * mag;
+}
+
+void sliding_stats::update(gr_complex z) {
+  if (d_window.size() < d_size) {
+    d_window.push_back(z);
+  } else {
+    add(d_window[d_next], -1);
+    d_window[d_next] = z;
+  }
+  d_next = (d_next + 1) % d_size;
+  add(z, 1);
+
+  if (++d_updates % d_size == 0) {
+    d_sum = d_sum_unit = 0;
+    d_sum_mag = d_sum_mag2 = 0;
+    for (auto w : d_window) {
+      add(w, 1);
+    }
+  }
+}
+
+inter_channel_summary sliding_stats::summary() const {
+  inter_channel_summary s;
+  double n = d_window.size();
+  s.count = n;
+  if (n == 0) {
+    return s;
+  }
+  s.mean = gr_complex(d_sum / n);
+  s.mag_mean = d_sum_mag / n;
+  s.mag_var = std::max(0.0, d_sum_mag2 / n - s.mag_mean * s.mag_mean);
+  set_phase(s, d_sum_unit / n);
+  return s;
+}
+
+ewma_stats::ewma_stats(double alpha) : d_alpha(alpha) {
+  if (alpha <= 0 || alpha > 1) {
+    throw std::invalid_argument("Invalid alpha value. Must be in (0, 1].");
+  }
+}
+
+void ewma_stats::update(gr_complex z) {
+  double mag = std::abs(z);
+  if (d_count == 0) {
+    d_mean = z;
+    d_mean_unit = unit(z);
+    d_mag_mean = mag;
+    d_mag_var = 0;
+    d_count = 1;
+    return;
+  }
+  double diff = mag - d_mag_mean;
+  d_mean += d_alpha * (std::complex<double>(z) - d_mean);
+  d_mean_unit += d_alpha * (unit(z) - d_mean_unit);
+  d_mag_mean += d_alpha * diff;
+  d_mag_var = (1 - d_alpha) * (d_mag_var + d_alpha * diff * diff);
+  d_count = (1 - d_alpha) * d_count + 1;
+}
+
+inter_channel_summary ewma_stats::summary() const {
+  inter_channel_summary s;
+  s.count = d_count;
+  if (d_count == 0) {
+    return s;
+  }
+  s.mean = gr_complex(d_mean);
+  s.mag_mean = d_mag_mean;
+  s.mag_var = d_mag_var;
+  set_phase(s, d_mean_unit);
+  return s;
+}
+
+pair_tracker::pair_tracker(size_t window, double alpha, double m)
+    : d_m(m), sliding(window), sliding_inliers(window), ewma(alpha), ewma_inliers(alpha) {}
+
+bool pair_tracker::is_outlier(gr_complex s_int) const {
+  if (count() < 5) {
+    return false;
+  }
+  double q1 = d_q1.value(), q3 = d_q3.value();
+  double iqr = q3 - q1;
+  double mag = std::abs(s_int);
+  return !(mag > q1 - d_m * iqr && mag < q3 + d_m * iqr);
+}
+
+bool pair_tracker::update(gr_complex s_int) {
+  bool outlier = is_outlier(s_int);
+  double mag = std::abs(s_int);
+  d_q1.update(mag);
+  d_q3.update(mag);
+  sliding.update(s_int);
+  ewma.update(s_int);
+  if (outlier) {
+    d_n_outliers++;
+  } else {
+    sliding_inliers.update(s_int);
+    ewma_inliers.update(s_int);
+  }
+  return outlier;
+}
+
+inter_channel_tracker::inter_channel_tracker(size_t window, double alpha, double m)
+    : d_window(window), d_alpha(alpha), d_m(m) {
+  // checks the parameters before the first estimate
+  (void)pair_tracker(window, alpha, m);
+}
+
+bool inter_channel_tracker::update(const std::string &pair, gr_complex s_int) {
+  auto it = d_pairs.find(pair);
+  if (it == d_pairs.end()) {
+    it = d_pairs.emplace(pair, pair_tracker(d_window, d_alpha, d_m)).first;
+  }
+  return it->second.update(s_int);
+}
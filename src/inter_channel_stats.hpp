@@ -0,0 +1,132 @@
+#pragma once
+
+#include <gnuradio/gr_complex.h>
+
+#include <array>
+#include <complex>
+#include <map>
+#include <string>
+#include <vector>
+
+// Statistics of the inter-channel estimates in a window.
+struct inter_channel_summary {
+  double count = 0;         // estimates in the window, their total weight for exponential windows
+  gr_complex mean = 0;      // complex mean
+  double mag_mean = 0;      // mean magnitude
+  double mag_var = 0;       // magnitude variance
+  double phase_mean = 0;    // circular mean of the phase
+  double phase_var = 1;     // circular variance of the phase, 1 - |mean of exp(j phase)|
+};
+
+// Streaming estimate of one quantile with the P² algorithm (Jain & Chlamtac, 1985), see lib/quantile.py.
+class p2_quantile {
+ private:
+  double d_p;
+  size_t d_count = 0;
+  std::array<double, 5> d_heights{};
+  std::array<double, 5> d_positions{1, 2, 3, 4, 5};
+  std::array<double, 5> d_desired;
+  std::array<double, 5> d_increments;
+
+ public:
+  p2_quantile(double p);
+
+  void update(double x);
+
+  // exact until 5 values were added, NaN without values
+  double value() const;
+
+  size_t count() const { return d_count; }
+};
+
+// Sliding window over the last `size` estimates. Sums are updated in O(1) and recomputed from the window once per
+// `size` updates so that rounding errors do not accumulate.
+class sliding_stats {
+ private:
+  size_t d_size;
+  std::vector<gr_complex> d_window;
+  size_t d_next = 0;
+  size_t d_updates = 0;
+  std::complex<double> d_sum = 0;
+  std::complex<double> d_sum_unit = 0;
+  double d_sum_mag = 0;
+  double d_sum_mag2 = 0;
+
+  void add(gr_complex z, double sign);
+
+ public:
+  sliding_stats(size_t size);
+
+  void update(gr_complex z);
+
+  inter_channel_summary summary() const;
+};
+
+// Exponentially weighted statistics, each new estimate has weight alpha.
+class ewma_stats {
+ private:
+  double d_alpha;
+  double d_count = 0;
+  std::complex<double> d_mean = 0;
+  std::complex<double> d_mean_unit = 0;
+  double d_mag_mean = 0;
+  double d_mag_var = 0;
+
+ public:
+  ewma_stats(double alpha);
+
+  void update(gr_complex z);
+
+  inter_channel_summary summary() const;
+};
+
+// Running statistics of the inter-channel estimates of one tag pair, over a sliding and an exponential window, of all
+// estimates and of the estimates which are not outliers. An estimate is an outlier when its magnitude is not strictly
+// within m iqrs of the quartiles of the previous magnitudes, estimated with P², as utils.arg_outliers does over a
+// whole capture. Memory does not depend on the number of estimates.
+class pair_tracker {
+ private:
+  double d_m;
+  size_t d_n_outliers = 0;
+  p2_quantile d_q1{0.25};
+  p2_quantile d_q3{0.75};
+
+ public:
+  sliding_stats sliding;
+  sliding_stats sliding_inliers;
+  ewma_stats ewma;
+  ewma_stats ewma_inliers;
+
+  pair_tracker(size_t window, double alpha, double m);
+
+  // Returns whether the estimate is an outlier, estimates are only flagged once 5 were added.
+  bool update(gr_complex s_int);
+
+  bool is_outlier(gr_complex s_int) const;
+
+  size_t count() const { return d_q1.count(); }
+
+  size_t n_outliers() const { return d_n_outliers; }
+};
+
+// pair_tracker for every tag pair, e.g. "1-2", created on their first estimate.
+class inter_channel_tracker {
+ private:
+  size_t d_window;
+  double d_alpha;
+  double d_m;
+  std::map<std::string, pair_tracker> d_pairs;
+
+ public:
+  inter_channel_tracker(size_t window = 100, double alpha = 0.05, double m = 2);
+
+  bool update(const std::string &pair, gr_complex s_int);
+
+  const pair_tracker &operator[](const std::string &pair) const { return d_pairs.at(pair); }
+
+  const std::map<std::string, pair_tracker> &pairs() const { return d_pairs; }
+
+  void reset() { d_pairs.clear(); }
+
+  void reset(const std::string &pair) { d_pairs.erase(pair); }
+};
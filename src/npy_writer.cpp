@@ -0,0 +1,195 @@
+#include "npy_writer.hpp"
+
+#include <zlib.h>
+
+#include <cstdint>
+#include <cstring>
+
+#include "cnpy.hpp"
+
+using cnpy::operator+=;
+
+namespace {
+// magic, version and header length included; leaves room for a first dimension of any size
+const size_t NPY_HEADER_SIZE = 128;
+const size_t COPY_BLOCK_SIZE = 1 << 20;
+const uint32_t ZIP64_MARKER = 0xffffffff;
+const uint16_t ZIP64_VERSION = 45;
+
+void write_all(const std::vector<char> &buf, FILE *fp) {
+  if (std::fwrite(buf.data(), 1, buf.size(), fp) != buf.size()) {
+    throw std::runtime_error("npz_pack: write error.");
+  }
+}
+}  // namespace
+
+npy_writer::npy_writer(const std::string &fname, const std::type_info &type, size_t word_size,
+                       const std::vector<size_t> &row_shape)
+    : d_word_size(word_size), d_row_shape(row_shape) {
+  d_row_size = 1;
+  for (size_t n : row_shape) {
+    d_row_size *= n;
+  }
+  d_descr = std::string(1, cnpy::BigEndianTest()) + cnpy::map_type(type) + std::to_string(word_size);
+  d_fp = std::fopen(fname.c_str(), "wb");
+  if (!d_fp) {
+    throw std::runtime_error("npy_writer: cannot open " + fname);
+  }
+  write_header();
+}
+
+npy_writer::~npy_writer() {
+  try {
+    flush();
+  } catch (const std::exception &) {
+  }
+  std::fclose(d_fp);
+}
+
+void npy_writer::write_header() {
+  std::string shape = "(" + std::to_string(d_n_rows) + ",";
+  for (size_t i = 0; i < d_row_shape.size(); i++) {
+    shape += (i ? ", " : " ") + std::to_string(d_row_shape[i]);
+  }
+  shape += ")";
+  std::string dict = "{'descr': '" + d_descr + "', 'fortran_order': False, 'shape': " + shape + ", }";
+  // pad with spaces so that magic string, version, length and dict end with a newline at NPY_HEADER_SIZE
+  dict.resize(NPY_HEADER_SIZE - 10 - 1, ' ');
+  dict += '\n';
+
+  std::vector<char> header;
+  header += (char)0x93;
+  header += "NUMPY";
+  header += (char)0x01;
+  header += (char)0x00;
+  header += (uint16_t)dict.size();
+  header += dict;
+
+  long pos = std::ftell(d_fp);
+  std::fseek(d_fp, 0, SEEK_SET);
+  if (std::fwrite(header.data(), 1, header.size(), d_fp) != header.size()) {
+    throw std::runtime_error("npy_writer: write error.");
+  }
+  if (pos > 0) {
+    std::fseek(d_fp, pos, SEEK_SET);
+  }
+}
+
+void npy_writer::flush() {
+  write_header();
+  std::fflush(d_fp);
+}
+
+void npz_pack(const std::string &zipname, const std::vector<std::pair<std::string, std::string>> &members) {
+  FILE *fp = std::fopen(zipname.c_str(), "wb");
+  if (!fp) {
+    throw std::runtime_error("npz_pack: cannot open " + zipname);
+  }
+  std::vector<char> central_dir;
+  std::vector<char> buf(COPY_BLOCK_SIZE);
+
+  for (const auto &[name, path] : members) {
+    std::string fname = name + ".npy";
+    FILE *in = std::fopen(path.c_str(), "rb");
+    if (!in) {
+      std::fclose(fp);
+      throw std::runtime_error("npz_pack: cannot open " + path);
+    }
+    std::fseek(in, 0, SEEK_END);
+    uint64_t size = std::ftell(in);
+    std::fseek(in, 0, SEEK_SET);
+    uint64_t offset = std::ftell(fp);
+
+    // local file header, the sizes are in the ZIP64 extra field and the CRC is patched after the data is copied
+    std::vector<char> local_header;
+    local_header += (uint32_t)0x04034b50;
+    local_header += ZIP64_VERSION;
+    local_header += (uint16_t)0;  // flags
+    local_header += (uint16_t)0;  // stored
+    local_header += (uint16_t)0;  // mod time
+    local_header += (uint16_t)0;  // mod date
+    local_header += (uint32_t)0;  // crc32
+    local_header += ZIP64_MARKER;
+    local_header += ZIP64_MARKER;
+    local_header += (uint16_t)fname.size();
+    local_header += (uint16_t)20;
+    local_header += fname;
+    local_header += (uint16_t)0x0001;
+    local_header += (uint16_t)16;
+    local_header += size;
+    local_header += size;
+    write_all(local_header, fp);
+
+    uLong crc = crc32(0L, Z_NULL, 0);
+    size_t n;
+    while ((n = std::fread(buf.data(), 1, buf.size(), in)) > 0) {
+      crc = crc32(crc, (const Bytef *)buf.data(), n);
+      if (std::fwrite(buf.data(), 1, n, fp) != n) {
+        std::fclose(in);
+        std::fclose(fp);
+        throw std::runtime_error("npz_pack: write error.");
+      }
+    }
+    std::fclose(in);
+    long end = std::ftell(fp);
+    std::fseek(fp, offset + 14, SEEK_SET);
+    uint32_t crc32_le = crc;
+    std::fwrite(&crc32_le, 4, 1, fp);
+    std::fseek(fp, end, SEEK_SET);
+
+    central_dir += (uint32_t)0x02014b50;
+    central_dir += ZIP64_VERSION;  // version made by
+    central_dir += ZIP64_VERSION;  // version needed
+    central_dir += (uint16_t)0;
+    central_dir += (uint16_t)0;
+    central_dir += (uint16_t)0;
+    central_dir += (uint16_t)0;
+    central_dir += crc32_le;
+    central_dir += ZIP64_MARKER;
+    central_dir += ZIP64_MARKER;
+    central_dir += (uint16_t)fname.size();
+    central_dir += (uint16_t)28;
+    central_dir += (uint16_t)0;  // comment length
+    central_dir += (uint16_t)0;  // disk number
+    central_dir += (uint16_t)0;  // internal attributes
+    central_dir += (uint32_t)0;  // external attributes
+    central_dir += ZIP64_MARKER;
+    central_dir += fname;
+    central_dir += (uint16_t)0x0001;
+    central_dir += (uint16_t)24;
+    central_dir += size;
+    central_dir += size;
+    central_dir += offset;
+  }
+
+  uint64_t central_dir_offset = std::ftell(fp);
+  uint64_t n_members = members.size();
+  std::vector<char> footer = central_dir;
+  uint64_t zip64_end_offset = central_dir_offset + central_dir.size();
+  // ZIP64 end of central directory record and locator
+  footer += (uint32_t)0x06064b50;
+  footer += (uint64_t)44;
+  footer += ZIP64_VERSION;
+  footer += ZIP64_VERSION;
+  footer += (uint32_t)0;
+  footer += (uint32_t)0;
+  footer += n_members;
+  footer += n_members;
+  footer += (uint64_t)central_dir.size();
+  footer += central_dir_offset;
+  footer += (uint32_t)0x07064b50;
+  footer += (uint32_t)0;
+  footer += zip64_end_offset;
+  footer += (uint32_t)1;
+  // end of central directory record
+  footer += (uint32_t)0x06054b50;
+  footer += (uint16_t)0;
+  footer += (uint16_t)0;
+  footer += (uint16_t)n_members;
+  footer += (uint16_t)n_members;
+  footer += ZIP64_MARKER;
+  footer += ZIP64_MARKER;
+  footer += (uint16_t)0;
+  write_all(footer, fp);
+  std::fclose(fp);
+}
@@ -0,0 +1,50 @@
+#pragma once
+
+#include <cstdio>
+#include <stdexcept>
+#include <string>
+#include <typeinfo>
+#include <utility>
+#include <vector>
+
+// An .npy file growing along its first axis. The header has a fixed size and is rewritten in place with the number of
+// rows on every flush, so the file is a valid array, readable with np.load, after each flush.
+class npy_writer {
+ private:
+  FILE *d_fp;
+  size_t d_row_size;  // elements per row
+  size_t d_word_size;
+  size_t d_n_rows = 0;
+  std::string d_descr;
+  std::vector<size_t> d_row_shape;
+
+  void write_header();
+
+ public:
+  npy_writer(const std::string &fname, const std::type_info &type, size_t word_size,
+             const std::vector<size_t> &row_shape = {});
+  ~npy_writer();
+
+  npy_writer(const npy_writer &) = delete;
+  npy_writer &operator=(const npy_writer &) = delete;
+
+  template <typename T>
+  void append(const T *data, size_t n_rows) {
+    if (sizeof(T) != d_word_size) {
+      throw std::invalid_argument("npy_writer: element size does not match the array type.");
+    }
+    if (std::fwrite(data, sizeof(T) * d_row_size, n_rows, d_fp) != n_rows) {
+      throw std::runtime_error("npy_writer: write error.");
+    }
+    d_n_rows += n_rows;
+  }
+
+  // Writes the number of rows appended so far to the header and flushes the file.
+  void flush();
+
+  size_t n_rows() const { return d_n_rows; }
+};
+
+// Packs .npy files into an uncompressed .npz archive, given as (name, path) pairs, copying them block by block. The
+// archive uses ZIP64 records, so members may exceed 4 GiB.
+void npz_pack(const std::string &zipname, const std::vector<std::pair<std::string, std::string>> &members);
@@ -1,9 +1,108 @@
 #include <pybind11/complex.h>
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <exception>
+#include <stdexcept>
+
 #include "../extract_inter_channel.hpp"
 
+namespace py = pybind11;
+
+// C-contiguous complex64 arrays are viewed without copying, other arrays are converted to complex64
+using complex_array = py::array_t<gr_complex, py::array::c_style | py::array::forcecast>;
+
+// A 1-D array or the rows of a 2-D array
+struct frame_rows {
+  const gr_complex *ptr;
+  ssize_t n_rows;
+  ssize_t row_len;
+  bool is_1d;
+
+  frame_rows(const complex_array &arr, const char *name) {
+    if (arr.ndim() != 1 && arr.ndim() != 2) {
+      throw std::invalid_argument(std::string(name) + " must be a 1-D or 2-D array.");
+    }
+    is_1d = arr.ndim() == 1;
+    ptr = arr.data();
+    n_rows = is_1d ? 1 : arr.shape(0);
+    row_len = arr.shape(arr.ndim() - 1);
+  }
+
+  const gr_complex *row(ssize_t i) const { return ptr + i * row_len; }
+};
+
+// A scalar broadcast to every frame, or one value per frame
+struct frame_values {
+  const gr_complex *ptr;
+  ssize_t stride;
+
+  frame_values(const complex_array &arr, ssize_t n_rows, const char *name) {
+    if (arr.size() != 1 && arr.size() != n_rows) {
+      throw std::invalid_argument(std::string(name) + " must be a scalar or have one value per frame.");
+    }
+    ptr = arr.data();
+    stride = arr.size() == 1 ? 0 : 1;
+  }
+
+  gr_complex operator[](ssize_t i) const { return ptr[i * stride]; }
+};
+
+py::tuple extract_inter_channel_py(const complex_array &frames, const complex_array &dc_samples,
+                                   const complex_array &dc_est, const complex_array &h_est) {
+  frame_rows frame(frames, "frames");
+  frame_rows dc(dc_samples, "dc_samples");
+  if (dc.is_1d != frame.is_1d || dc.n_rows != frame.n_rows) {
+    throw std::invalid_argument("dc_samples must have one row per frame.");
+  }
+  frame_values dc_ests(dc_est, frame.n_rows, "dc_est");
+  frame_values h_ests(h_est, frame.n_rows, "h_est");
+
+  py::array_t<gr_complex> s_int(frame.n_rows);
+  py::array_t<int> labels({frame.n_rows, frame.row_len});
+  gr_complex *s_int_ptr = s_int.mutable_data();
+  int *labels_ptr = labels.mutable_data();
+  std::exception_ptr error;
+  {
+    py::gil_scoped_release release;
+    if (frame.is_1d) {
+      try {
+        s_int_ptr[0] = extract_inter_channel(frame.row(0), frame.row_len, dc.row(0), dc.row_len, dc_ests[0],
+                                             h_ests[0], labels_ptr);
+      } catch (...) {
+        error = std::current_exception();
+      }
+    } else {
+      // one frame per thread, each frame running serially
+#pragma omp parallel for schedule(dynamic)
+      for (ssize_t i = 0; i < frame.n_rows; i++) {
+        try {
+          s_int_ptr[i] = extract_inter_channel(frame.row(i), frame.row_len, dc.row(i), dc.row_len, dc_ests[i],
+                                               h_ests[i], labels_ptr + i * frame.row_len, false);
+        } catch (...) {
+#pragma omp critical
+          if (!error) {
+            error = std::current_exception();
+          }
+        }
+      }
+    }
+  }
+  if (error) {
+    std::rethrow_exception(error);
+  }
+  if (frame.is_1d) {
+    return py::make_tuple(s_int_ptr[0], labels.reshape({frame.row_len}));
+  }
+  return py::make_tuple(s_int, labels);
+}
+
 PYBIND11_MODULE(extract_inter_channel_cxx, m) {
-  m.def("extract_inter_channel", &extract_inter_channel, "Extract inter channel from RN16 frame.");
+  m.def("extract_inter_channel", &extract_inter_channel_py, py::arg("frames"), py::arg("dc_samples"),
+        py::arg("dc_est"), py::arg("h_est"),
+        "Extract inter channel from an RN16 frame, or from every row of a 2-D array of frames.\n\n"
+        "Returns the inter channel and the label of every sample: a complex and a 1-D int array for a 1-D frame, "
+        "or a complex64 array and a 2-D int array for 2-D frames. dc_est and h_est are scalars or have one value "
+        "per frame.");
 }
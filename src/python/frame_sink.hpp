@@ -0,0 +1,102 @@
+#pragma once
+
+#include <pybind11/complex.h>
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+
+#include <cstring>
+#include <vector>
+
+#include "../rfid_detector.hpp"
+
+namespace py = pybind11;
+
+// Hands the frames found by rfid_detector to Python.
+//
+// With batch_size 1 the callback is called as callback(frame, dc, dc_est, h_est, start) with read-only arrays viewing
+// the detector's buffers, which are only valid during the call. Otherwise frames are copied into batches and the
+// callback is called as callback(frames, dcs, dc_ests, h_ests, starts) with new arrays once batch_size frames are
+// found, or on flush(). Without a callback, frames are collected until take() returns them.
+class frame_sink {
+ private:
+  py::object d_callback;
+  size_t d_batch_size;
+  size_t d_n_frame = 0;
+  size_t d_n_dc = 0;
+  std::vector<gr_complex> d_frames;
+  std::vector<gr_complex> d_dcs;
+  std::vector<gr_complex> d_dc_ests;
+  std::vector<gr_complex> d_h_ests;
+  std::vector<uint64_t> d_starts;
+
+  static py::array_t<gr_complex> view(const gr_complex *ptr, size_t n) {
+    // a base object keeps pybind11 from copying the buffer
+    py::array_t<gr_complex> arr({n}, {sizeof(gr_complex)}, ptr, py::capsule(ptr, [](void *) {}));
+    arr.attr("setflags")(py::arg("write") = false);
+    return arr;
+  }
+
+  template <typename T>
+  static py::array_t<T> array(const std::vector<T> &data, std::vector<size_t> shape) {
+    py::array_t<T> arr(shape);
+    std::memcpy(arr.mutable_data(), data.data(), data.size() * sizeof(T));
+    return arr;
+  }
+
+ public:
+  frame_sink(py::object callback, size_t batch_size) : d_callback(callback), d_batch_size(batch_size) {
+    if (batch_size == 0) {
+      throw std::invalid_argument("batch_size must be at least 1.");
+    }
+  }
+
+  ~frame_sink() {
+    py::gil_scoped_acquire acquire;
+    d_callback = py::object();
+  }
+
+  bool has_callback() const { return !d_callback.is_none(); }
+
+  // Called by the detector, without the GIL.
+  void operator()(const gr_complex *frame, size_t n_frame, const gr_complex *dc, size_t n_dc, gr_complex dc_est,
+                  gr_complex h_est, uint64_t start) {
+    if (has_callback() && d_batch_size == 1) {
+      py::gil_scoped_acquire acquire;
+      d_callback(view(frame, n_frame), view(dc, n_dc), dc_est, h_est, start);
+      return;
+    }
+    d_n_frame = n_frame;
+    d_n_dc = n_dc;
+    d_frames.insert(d_frames.end(), frame, frame + n_frame);
+    d_dcs.insert(d_dcs.end(), dc, dc + n_dc);
+    d_dc_ests.push_back(dc_est);
+    d_h_ests.push_back(h_est);
+    d_starts.push_back(start);
+    if (has_callback() && d_starts.size() >= d_batch_size) {
+      flush();
+    }
+  }
+
+  // Returns the collected frames as (starts, frames, dcs, dc_ests, h_ests) and clears them. Needs the GIL.
+  py::tuple take() {
+    size_t n = d_starts.size();
+    auto batch = py::make_tuple(array(d_starts, {n}), array(d_frames, {n, d_n_frame}), array(d_dcs, {n, d_n_dc}),
+                                array(d_dc_ests, {n}), array(d_h_ests, {n}));
+    d_frames.clear();
+    d_dcs.clear();
+    d_dc_ests.clear();
+    d_h_ests.clear();
+    d_starts.clear();
+    return batch;
+  }
+
+  // Passes the pending frames to the callback. Can be called without the GIL.
+  void flush() {
+    if (!has_callback() || d_starts.empty()) {
+      return;
+    }
+    py::gil_scoped_acquire acquire;
+    auto batch = take();
+    d_callback(batch[1], batch[2], batch[3], batch[4], batch[0]);
+  }
+};
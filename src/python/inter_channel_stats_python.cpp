@@ -0,0 +1,98 @@
+#include <pybind11/complex.h>
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+#include <optional>
+
+#include "../inter_channel_stats.hpp"
+
+namespace py = pybind11;
+
+// C-contiguous complex64 arrays are read without copying, other arrays and scalars are converted to complex64
+using complex_array = py::array_t<gr_complex, py::array::c_style | py::array::forcecast>;
+
+py::dict to_dict(const inter_channel_summary &s) {
+  py::dict d;
+  d["count"] = s.count;
+  d["mean"] = s.mean;
+  d["mag_mean"] = s.mag_mean;
+  d["mag_var"] = s.mag_var;
+  d["phase_mean"] = s.phase_mean;
+  d["phase_var"] = s.phase_var;
+  return d;
+}
+
+py::object update(inter_channel_tracker &tracker, const std::string &pair, const complex_array &s_int) {
+  if (s_int.ndim() == 0) {
+    return py::bool_(tracker.update(pair, *s_int.data()));
+  }
+  if (s_int.ndim() != 1) {
+    throw std::invalid_argument("s_int must be a scalar or a 1-D array.");
+  }
+  py::array_t<bool> outliers(s_int.size());
+  bool *out = outliers.mutable_data();
+  const gr_complex *in = s_int.data();
+  // the GIL is kept so that the tracker is never read while it is updated
+  for (ssize_t i = 0; i < s_int.size(); i++) {
+    out[i] = tracker.update(pair, in[i]);
+  }
+  return outliers;
+}
+
+py::dict summary(const inter_channel_tracker &tracker, const std::string &pair) {
+  auto it = tracker.pairs().find(pair);
+  if (it == tracker.pairs().end()) {
+    throw py::key_error("No estimate of pair " + pair);
+  }
+  const pair_tracker &t = it->second;
+  py::dict d;
+  d["count"] = t.count();
+  d["n_outliers"] = t.n_outliers();
+  d["sliding"] = to_dict(t.sliding.summary());
+  d["sliding_inliers"] = to_dict(t.sliding_inliers.summary());
+  d["ewma"] = to_dict(t.ewma.summary());
+  d["ewma_inliers"] = to_dict(t.ewma_inliers.summary());
+  return d;
+}
+
+PYBIND11_MODULE(inter_channel_stats_cxx, m) {
+  py::class_<inter_channel_tracker>(
+      m, "inter_channel_tracker",
+      "Running statistics of the inter-channel estimates of every tag pair, over the last `window` estimates and over "
+      "an exponential window where each estimate has weight `alpha`, of all estimates and of the estimates which are "
+      "not outliers. An estimate is an outlier when its magnitude is not strictly within `m` iqrs of the quartiles of "
+      "the previous magnitudes of its pair, estimated with P². Memory does not depend on the number of estimates.\n\n"
+      "Each window reports count, mean (complex), mag_mean, mag_var, phase_mean and phase_var (circular variance).")
+      .def(py::init<size_t, double, double>(), py::arg("window") = 100, py::arg("alpha") = 0.05, py::arg("m") = 2.0)
+      .def("update", &update, py::arg("pair"), py::arg("s_int"),
+           "Adds an estimate or a 1-D array of estimates of a pair, returns whether they are outliers.")
+      .def(
+          "is_outlier",
+          [](const inter_channel_tracker &tracker, const std::string &pair, gr_complex s_int) {
+            auto it = tracker.pairs().find(pair);
+            return it != tracker.pairs().end() && it->second.is_outlier(s_int);
+          },
+          py::arg("pair"), py::arg("s_int"), "Whether an estimate would be an outlier, without adding it.")
+      .def("summary", &summary, py::arg("pair"),
+           "Returns the statistics of a pair: count, n_outliers and a dict per window, sliding, sliding_inliers, ewma "
+           "and ewma_inliers.")
+      .def_property_readonly("pairs",
+                             [](const inter_channel_tracker &tracker) {
+                               std::vector<std::string> pairs;
+                               for (const auto &[pair, _] : tracker.pairs()) {
+                                 pairs.push_back(pair);
+                               }
+                               return pairs;
+                             })
+      .def(
+          "reset",
+          [](inter_channel_tracker &tracker, std::optional<std::string> pair) {
+            if (pair) {
+              tracker.reset(*pair);
+            } else {
+              tracker.reset();
+            }
+          },
+          py::arg("pair") = py::none(), "Forgets the estimates of a pair, or of every pair.");
+}
@@ -0,0 +1,62 @@
+#include <pybind11/pybind11.h>
+
+#include <memory>
+
+#include "../rfid_block.hpp"
+#include "frame_sink.hpp"
+
+namespace py = pybind11;
+
+// rfid_block passing its frames to a Python callback, see frame_sink.
+class py_rfid_block : public rfid_block {
+ private:
+  std::shared_ptr<frame_sink> d_sink;
+
+  // the scheduler thread cannot propagate Python errors, so they are reported and the stream goes on
+  static void report(const std::function<void()> &fn) {
+    try {
+      fn();
+    } catch (py::error_already_set &e) {
+      py::gil_scoped_acquire acquire;
+      e.discard_as_unraisable("rfid_block callback");
+    }
+  }
+
+ public:
+  typedef std::shared_ptr<py_rfid_block> sptr;
+
+  static sptr make(py::object callback, size_t batch_size) {
+    return gnuradio::make_block_sptr<py_rfid_block>(std::make_shared<frame_sink>(callback, batch_size));
+  }
+
+  py_rfid_block(std::shared_ptr<frame_sink> sink)
+      : rfid_block(frame_callback_t([sink](const gr_complex *frame, size_t n_frame, const gr_complex *dc, size_t n_dc,
+                                           gr_complex dc_est, gr_complex h_est, uint64_t start) {
+          report([&] { (*sink)(frame, n_frame, dc, n_dc, dc_est, h_est, start); });
+        })),
+        d_sink(sink) {}
+
+  void flush() {
+    report([this] { d_sink->flush(); });
+  }
+
+  bool stop() override {
+    flush();
+    return rfid_block::stop();
+  }
+};
+
+PYBIND11_MODULE(rfid_block_cxx, m) {
+  py::module_::import("gnuradio.gr");
+
+  py::class_<py_rfid_block, gr::block, gr::basic_block, std::shared_ptr<py_rfid_block>>(
+      m, "rfid_block",
+      "GNU Radio sink running the reader command / RN16 detector and passing the frames to a Python callback.\n\n"
+      "With batch_size 1 the callback is called as callback(frame, dc, dc_est, h_est, start) with read-only views of "
+      "the detector's buffers, only valid during the call. Otherwise it is called as "
+      "callback(frames, dcs, dc_ests, h_ests, starts) with batches of batch_size frames, and the last incomplete "
+      "batch when the flowgraph stops.")
+      .def(py::init(&py_rfid_block::make), py::arg("callback"), py::arg("batch_size") = 1)
+      .def("flush", &py_rfid_block::flush, py::call_guard<py::gil_scoped_release>(),
+           "Passes the frames of an incomplete batch to the callback.");
+}
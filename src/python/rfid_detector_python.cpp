@@ -0,0 +1,69 @@
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+
+#include "../rfid_detector.hpp"
+#include "frame_sink.hpp"
+
+namespace py = pybind11;
+
+// C-contiguous complex64 arrays are read without copying, other arrays are converted to complex64
+using complex_array = py::array_t<gr_complex, py::array::c_style | py::array::forcecast>;
+
+class py_rfid_detector {
+ private:
+  frame_sink d_sink;
+  rfid_detector d_detector;
+
+ public:
+  py_rfid_detector(py::object callback, size_t batch_size)
+      : d_sink(callback, batch_size),
+        d_detector([this](const gr_complex *frame, size_t n_frame, const gr_complex *dc, size_t n_dc,
+                          gr_complex dc_est, gr_complex h_est,
+                          uint64_t start) { d_sink(frame, n_frame, dc, n_dc, dc_est, h_est, start); }) {}
+
+  py::object process(const complex_array &samples) {
+    if (samples.ndim() != 1) {
+      throw std::invalid_argument("samples must be a 1-D array.");
+    }
+    {
+      py::gil_scoped_release release;
+      d_detector.process(samples.data(), samples.size());
+    }
+    if (!d_sink.has_callback()) {
+      return d_sink.take();
+    }
+    return py::none();
+  }
+
+  void flush() {
+    py::gil_scoped_release release;
+    d_sink.flush();
+  }
+
+  uint64_t nitems_read() const { return d_detector.nitems_read(); }
+};
+
+py::object process(const complex_array &samples, py::object callback, size_t batch_size) {
+  py_rfid_detector detector(callback, batch_size);
+  auto frames = detector.process(samples);
+  detector.flush();
+  return frames;
+}
+
+PYBIND11_MODULE(rfid_detector_cxx, m) {
+  py::class_<py_rfid_detector>(m, "rfid_detector",
+                               "The reader command / RN16 detector of rfid_block, fed with NumPy arrays.\n\n"
+                               "With batch_size 1 the callback is called as callback(frame, dc, dc_est, h_est, start) "
+                               "with read-only views of the detector's buffers, only valid during the call. Otherwise "
+                               "it is called as callback(frames, dcs, dc_ests, h_ests, starts) with batches of "
+                               "batch_size frames. Without a callback, process returns the frames it found as "
+                               "(starts, frames, dcs, dc_ests, h_ests).")
+      .def(py::init<py::object, size_t>(), py::arg("callback") = py::none(), py::arg("batch_size") = 1)
+      .def("process", &py_rfid_detector::process, py::arg("samples"),
+           "Runs the detector over the next samples of the stream.")
+      .def("flush", &py_rfid_detector::flush, "Passes the frames of an incomplete batch to the callback.")
+      .def_property_readonly("nitems_read", &py_rfid_detector::nitems_read);
+
+  m.def("process", &process, py::arg("samples"), py::arg("callback") = py::none(), py::arg("batch_size") = 1,
+        "Runs a new detector over a whole capture, see rfid_detector.");
+}
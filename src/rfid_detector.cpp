@@ -0,0 +1,118 @@
+#include "rfid_detector.hpp"
+
+#include <algorithm>
+#include <numeric>
+
+rfid_detector::rfid_detector(frame_callback_t cb)
+    : d_callback(cb), d_dc_ring(2 * (config::N_T1 / 2)) {
+  for (int i = 0; i < config::FM0_PREAMBLE_LEN; i++) {
+    for (int j = 0; j < config::SPS; j++) {
+      d_preamble_samples.push_back(gr_complex(config::FM0_PREAMBLE[i], 0));
+    }
+  }
+  d_rn16_frame.reserve(config::N_RN16_FRAME + d_preamble_samples.size() + config::CORRELATION_LEN);
+}
+
+void rfid_detector::process(const gr_complex *in, size_t n) {
+  try {
+    run(in, n);
+  } catch (...) {
+    // the rest of the samples are dropped if the callback throws
+    d_nitems_read += n;
+    throw;
+  }
+  d_nitems_read += n;
+}
+
+void rfid_detector::run(const gr_complex *in, size_t n) {
+  const size_t n_dc = d_dc_ring.size() / 2;
+  float sample_ampl;
+  for (size_t i = 0; i < n; i++) {
+    switch (d_status) {
+      case SEEK_READER_COMMAND:
+        d_dc_ring[d_dc_pos] = in[i];
+        d_dc_ring[d_dc_pos + n_dc] = in[i];
+        d_dc_pos = (d_dc_pos + 1) % n_dc;
+        d_dc_size = std::min(d_dc_size + 1, n_dc);
+        sample_ampl = std::abs(in[i]);
+        d_pulse_nsamples++;
+        // negative edge
+        if (sample_ampl <= config::PULSE_THRESHOLD && d_signal_level == HIGH) {
+          d_signal_level = LOW;
+          d_pulse_nsamples = 0;
+        }
+        // positive edge
+        if (sample_ampl > config::PULSE_THRESHOLD && d_signal_level == LOW) {
+          d_signal_level = HIGH;
+          if (d_pulse_nsamples > config::N_PULSE_WIDTH / 2) {
+            d_pulse_count++;
+          } else {
+            d_pulse_count = 0;
+          }
+          d_pulse_nsamples = 0;
+        }
+        if (d_pulse_nsamples > config::N_T1 && d_signal_level == HIGH && d_pulse_count > config::READER_MIN_PULSES) {
+          d_rn16_frame.clear();
+          d_corr = 0;
+          d_corr_index = 0;
+          d_rn16_start_index = 0;
+          d_dc_est = std::accumulate(dc_samples(), dc_samples() + d_dc_size, gr_complex(0, 0)) /
+                     gr_complex(d_dc_size, 0);
+          d_status = SYNC_RN16;
+        }
+        break;
+
+      case SYNC_RN16:
+        d_rn16_frame.push_back(in[i]);
+
+        if (d_rn16_frame.size() >= d_corr_index + d_preamble_samples.size()) {
+          gr_complex corr = 0;
+          for (size_t j = 0; j < d_preamble_samples.size(); j++) {
+            corr += (d_rn16_frame[d_corr_index + j] - d_dc_est) * d_preamble_samples[j];
+          }
+          d_corr_index++;
+          if (std::abs(corr) > d_corr) {
+            d_corr = std::abs(corr);
+            d_rn16_start_index = d_corr_index;
+          }
+        }
+
+        // 同步到 RN16 帧的前导码
+        if (d_corr_index >= config::CORRELATION_LEN) {
+          // 计算信道估计 h_est
+          d_h_est = 0;
+          int ones_in_preamble = 0;
+          for (int j = 0; j < config::FM0_PREAMBLE_LEN; j++) {
+            if (config::FM0_PREAMBLE[j] == 1) {
+              d_h_est += d_rn16_frame[d_rn16_start_index + j * config::SPS + config::SPS / 2];
+              ones_in_preamble++;
+            }
+          }
+          d_h_est /= gr_complex(ones_in_preamble, 0);
+
+          d_rn16_frame.erase(d_rn16_frame.begin(), d_rn16_frame.begin() + d_rn16_start_index);
+          d_frame_start = d_nitems_read + i - d_rn16_frame.size() + 1;
+          d_status = PROCESSING_RN16;
+        }
+
+        break;
+
+      case PROCESSING_RN16:
+        if (d_rn16_frame.size() < static_cast<size_t>(config::N_RN16_FRAME)) {
+          d_rn16_frame.push_back(in[i]);
+        } else {
+          d_signal_level = HIGH;
+          d_pulse_count = 0;
+          d_pulse_nsamples = 0;
+          d_status = SEEK_READER_COMMAND;
+
+          d_callback(d_rn16_frame.data(), d_rn16_frame.size(), dc_samples(), d_dc_size, d_dc_est, d_h_est,
+                     d_frame_start);
+        }
+        break;
+
+      default:
+        break;
+    }
+  }
+}
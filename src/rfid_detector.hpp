@@ -0,0 +1,59 @@
+#pragma once
+
+#include <gnuradio/gr_complex.h>
+
+#include <cstdint>
+#include <functional>
+#include <vector>
+
+#include "global.hpp"
+
+// Called with the frame, the DC samples, dc_est, h_est and the absolute index of the first frame sample. The
+// buffers are only valid during the call.
+typedef std::function<void(const gr_complex *, size_t, const gr_complex *, size_t, gr_complex, gr_complex, uint64_t)>
+    frame_callback_t;
+
+enum level_t {
+  LOW,
+  HIGH,
+};
+
+enum status_t {
+  SEEK_READER_COMMAND,
+  SYNC_RN16,
+  PROCESSING_RN16,
+};
+
+// The reader command / RN16 state machine of rfid_block, without GNU Radio.
+class rfid_detector {
+ private:
+  status_t d_status = SEEK_READER_COMMAND;
+  int d_pulse_count = 0;
+  level_t d_signal_level = HIGH;
+  int d_pulse_nsamples = 0;
+  gr_complex d_dc_est = 0;
+  gr_complex d_h_est = 0;
+  float d_corr = 0;
+  int d_corr_index = 0;
+  int d_rn16_start_index = 0;
+  uint64_t d_nitems_read = 0;
+  uint64_t d_frame_start = 0;
+  frame_callback_t d_callback;
+  std::vector<gr_complex> d_rn16_frame;
+  // the last N_T1 / 2 samples, stored twice so that they are always contiguous
+  std::vector<gr_complex> d_dc_ring;
+  size_t d_dc_pos = 0;
+  size_t d_dc_size = 0;
+  std::vector<gr_complex> d_preamble_samples;
+
+  void run(const gr_complex *in, size_t n);
+  const gr_complex *dc_samples() const { return d_dc_ring.data() + d_dc_pos + d_dc_ring.size() / 2 - d_dc_size; }
+
+ public:
+  rfid_detector(frame_callback_t cb);
+
+  // Runs the state machine over the next n samples of the stream.
+  void process(const gr_complex *in, size_t n);
+
+  uint64_t nitems_read() const { return d_nitems_read; }
+};
@@ -2,29 +2,59 @@
 #include <gnuradio/blocks/file_source.h>
 #include <gnuradio/top_block.h>
 
+#include <filesystem>
 #include <iostream>
+#include <memory>
 
-#include "cnpy.hpp"
 #include "extract_inter_channel.hpp"
+#include "npy_writer.hpp"
 #include "rfid_block.hpp"
 
-std::vector<gr_complex> frames;
-std::vector<int> frames_labels;
-std::vector<gr_complex> frames_dc;
-std::vector<gr_complex> inter_est;
+// Frames are appended to one .npy file per array in <output_file>.parts and the files are flushed every BATCH_SIZE
+// frames, so memory use does not grow with the capture and an interrupted run keeps the flushed frames. When the
+// flowgraph finishes, the files are packed into <output_file>, which np.load reads as before.
+const size_t BATCH_SIZE = 256;
 
-void p(const std::deque<gr_complex> &frame, const std::deque<gr_complex> &dc_samples, gr_complex dc_est,
-       gr_complex h_est) {
-  if (frame.size() != config::N_RN16_FRAME) {
-    return;
+struct rn16_writer {
+  npy_writer frames;
+  npy_writer frames_dc;
+  npy_writer inter_est;
+  npy_writer labels;
+  npy_writer offsets;
+  std::vector<int> frame_labels;
+
+  rn16_writer(const std::filesystem::path &dir)
+      : frames(dir / "frames.npy", typeid(gr_complex), sizeof(gr_complex), {(size_t)config::N_RN16_FRAME}),
+        frames_dc(dir / "frames_dc.npy", typeid(gr_complex), sizeof(gr_complex), {(size_t)config::N_T1 / 2}),
+        inter_est(dir / "inter_est.npy", typeid(gr_complex), sizeof(gr_complex)),
+        labels(dir / "labels.npy", typeid(int), sizeof(int), {(size_t)config::N_RN16_FRAME}),
+        offsets(dir / "offsets.npy", typeid(uint64_t), sizeof(uint64_t)),
+        frame_labels(config::N_RN16_FRAME) {}
+
+  void operator()(const gr_complex *frame, size_t n_frame, const gr_complex *dc_samples, size_t n_dc,
+                  gr_complex dc_est, gr_complex h_est, uint64_t start) {
+    if (n_frame != (size_t)config::N_RN16_FRAME) {
+      return;
+    }
+    auto s_int = extract_inter_channel(frame, n_frame, dc_samples, n_dc, dc_est, h_est, frame_labels.data());
+    frames.append(frame, 1);
+    frames_dc.append(dc_samples, 1);
+    inter_est.append(&s_int, 1);
+    labels.append(frame_labels.data(), 1);
+    offsets.append(&start, 1);
+    if (frames.n_rows() % BATCH_SIZE == 0) {
+      flush();
+    }
   }
-  frames_dc.insert(frames_dc.end(), dc_samples.begin(), dc_samples.end());
-  frames.insert(frames.end(), frame.begin(), frame.end());
-  std::vector<int> labels;
-  auto s_int = extract_inter_channel(frame, dc_samples, dc_est, h_est, labels);
-  frames_labels.insert(frames_labels.end(), labels.begin(), labels.end());
-  inter_est.push_back(s_int);
-}
+
+  void flush() {
+    frames.flush();
+    frames_dc.flush();
+    inter_est.flush();
+    labels.flush();
+    offsets.flush();
+  }
+};
 
 int main(int argc, char *argv[]) {
   if (argc != 3) {
@@ -32,20 +62,28 @@ int main(int argc, char *argv[]) {
     return 1;
   }
 
+  std::filesystem::path parts = std::string(argv[2]) + ".parts";
+  std::filesystem::create_directories(parts);
+  auto writer = std::make_shared<rn16_writer>(parts);
+
   gr::top_block_sptr tb = gr::make_top_block("main");
   auto source = gr::blocks::file_source::make(8, argv[1], false);
-  auto b = rfid_block::make(p);
+  auto b = rfid_block::make_frame_callback([writer](const gr_complex *frame, size_t n_frame,
+                                                    const gr_complex *dc_samples, size_t n_dc, gr_complex dc_est,
+                                                    gr_complex h_est, uint64_t start) {
+    (*writer)(frame, n_frame, dc_samples, n_dc, dc_est, h_est, start);
+  });
   tb->connect(source, 0, b, 0);
   tb->start();
   tb->wait();
 
-  cnpy::npz_save(argv[2], "frames", frames.data(),
-                 {frames.size() / config::N_RN16_FRAME, static_cast<size_t>(config::N_RN16_FRAME)}, "w");
-  cnpy::npz_save(argv[2], "frames_dc", frames_dc.data(),
-                 {frames_dc.size() / (config::N_T1 / 2), static_cast<size_t>(config::N_T1 / 2)}, "a");
-  cnpy::npz_save(argv[2], "inter_est", inter_est.data(), {inter_est.size()}, "a");
-  cnpy::npz_save(argv[2], "labels", frames_labels.data(),
-                 {frames_labels.size() / config::N_RN16_FRAME, static_cast<size_t>(config::N_RN16_FRAME)}, "a");
+  writer->flush();
+  npz_pack(argv[2], {{"frames", parts / "frames.npy"},
+                     {"frames_dc", parts / "frames_dc.npy"},
+                     {"inter_est", parts / "inter_est.npy"},
+                     {"labels", parts / "labels.npy"},
+                     {"offsets", parts / "offsets.npy"}});
+  std::filesystem::remove_all(parts);
 
   return 0;
 }
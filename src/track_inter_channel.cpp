@@ -6,19 +6,30 @@
 #include <vector>
 
 #include "extract_inter_channel.hpp"
+#include "inter_channel_stats.hpp"
 #include "rfid_block.hpp"
 
-void p(const std::deque<gr_complex> &frame, const std::deque<gr_complex> &dc_samples, gr_complex dc_est,
-       gr_complex h_est) {
-  std::vector<int> labels;
-  auto s_int = extract_inter_channel(frame, dc_samples, dc_est, h_est, labels);
-  std::cout << "s_int: mag=" << std::abs(s_int) << " phase=" << std::arg(s_int) << std::endl;
-}
-
 int main(int argc, char *argv[]) {
+  if (argc != 2 && argc != 3) {
+    std::cerr << "Usage: " << argv[0] << " <input_file> [tag_pair]" << std::endl;
+    return 1;
+  }
+  std::string pair = argc == 3 ? argv[2] : "1-2";
+  inter_channel_tracker tracker;
+  std::vector<int> labels(config::N_RN16_FRAME);
+
   gr::top_block_sptr tb = gr::make_top_block("main");
   auto source = gr::blocks::file_source::make(8, argv[1], false);
-  auto b = rfid_block::make(p);
+  auto b = rfid_block::make_frame_callback([&](const gr_complex *frame, size_t n_frame, const gr_complex *dc_samples,
+                                               size_t n_dc, gr_complex dc_est, gr_complex h_est, uint64_t) {
+    labels.resize(n_frame);
+    auto s_int = extract_inter_channel(frame, n_frame, dc_samples, n_dc, dc_est, h_est, labels.data());
+    bool outlier = tracker.update(pair, s_int);
+    auto s = tracker[pair].sliding_inliers.summary();
+    std::cout << "s_int: mag=" << std::abs(s_int) << " phase=" << std::arg(s_int) << (outlier ? " (outlier)" : "")
+              << " | mean: mag=" << s.mag_mean << " std=" << std::sqrt(s.mag_var) << " phase=" << s.phase_mean
+              << " circ_var=" << s.phase_var << std::endl;
+  });
   tb->connect(source, 0, b, 0);
   tb->start();
   tb->wait();